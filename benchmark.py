@@ -0,0 +1,224 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import shoprotator
+from catalog_generator import generate_catalog
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'benchmark_baseline.json')
+SIZES = [1000, 10000, 100000]
+ITERATIONS = 20
+MAX_STAGE_SECONDS = 10
+TOLERANCE = 0.25
+# Differences below these are timer and allocator noise, not regressions.
+NOISE_FLOOR = {"p50_ms": 0.5, "peak_kib": 64}
+SEASONS = 10
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Stands in for fortnite-api.com (name lookups) and Discord (webhooks).
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = json.dumps({"status": 200, "data": {"id": self.path.rsplit("/", 1)[-1], "name": "Synthetic"}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def isolate(work_dir, stub_url):
+    # Point every file and service the pipeline touches at the scratch
+    # directory and the stub server.
+    shoprotator.CONFIG_FILE = os.path.join(work_dir, 'catalog_config.json')
+    shoprotator.FORTNITE_API_URL = stub_url
+    shoprotator.OFFLINE = False
+    shoprotator.name_cache = shoprotator.NameCache(os.path.join(work_dir, 'item_names.jsonl'))
+    shoprotator.cosmetic_metadata = shoprotator.CosmeticMetadata(os.path.join(work_dir, 'cosmetics.db'))
+    shoprotator.discord_outbox = shoprotator.DiscordOutbox(os.path.join(work_dir, 'discord_outbox'))
+
+def measure(stage, iterations, max_seconds):
+    # stage(i) runs one operation and returns its own elapsed time, so any
+    # per-call setup stays out of the numbers. Peak memory comes from one
+    # extra traced call, keeping tracemalloc overhead out of the timings.
+    timings = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        timings.append(stage(i))
+        if time.perf_counter() - started > max_seconds and len(timings) >= 3:
+            break
+    tracemalloc.start()
+    stage(len(timings))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    timings.sort()
+    return {
+        "iterations": len(timings),
+        "ops_per_sec": len(timings) / sum(timings) if sum(timings) else 0.0,
+        "p50_ms": statistics.median(timings) * 1000,
+        "p99_ms": timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000,
+        "peak_kib": peak / 1024,
+    }
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+def run_size(size, work_dir, stub_url, iterations, max_seconds):
+    catalog_path = os.path.join(work_dir, 'catalog_data.json')
+    with open(catalog_path, 'w') as f:
+        json.dump(generate_catalog(size, SEASONS), f)
+    isolate(work_dir, stub_url)
+
+    def load_stage(i):
+        shoprotator._catalogs.clear()
+        compiled_path = os.path.splitext(catalog_path)[0] + '.pickle'
+        if os.path.exists(compiled_path):
+            os.remove(compiled_path)
+        return timed(shoprotator.load_catalog, catalog_path)
+
+    results = {"load_catalog": measure(load_stage, iterations, max_seconds)}
+    catalog = shoprotator.load_catalog(catalog_path)
+    results["build_pool"] = measure(
+        lambda i: timed(shoprotator.build_item_pool, catalog, SEASONS, True, True), iterations, max_seconds
+    )
+    pool = shoprotator.build_item_pool(catalog, SEASONS, True, True)
+    selections = []
+
+    def select_stage(i):
+        rng = random.Random(i)
+        used_items = set()
+        start = time.perf_counter()
+        try:
+            items = shoprotator.select_layout_items(pool, shoprotator.DEFAULT_LAYOUT, catalog["paired_featured_items"], True,
+                                                    used_items, rng)
+        finally:
+            pool.index.reset()
+        elapsed = time.perf_counter() - start
+        selections.append(items)
+        return elapsed
+
+    results["select"] = measure(select_stage, iterations, max_seconds)
+    shops = []
+
+    def add_items_stage(i):
+        start = time.perf_counter()
+        shop = shoprotator.add_items(selections[i % len(selections)], pool.records, random.Random(i))
+        elapsed = time.perf_counter() - start
+        shops.append(shop)
+        return elapsed
+
+    results["add_items"] = measure(add_items_stage, iterations, max_seconds)
+    fragments = shoprotator.FragmentCache(os.path.join(work_dir, 'item_shop.fragments.json'))
+    html_path = os.path.join(work_dir, 'item_shop.html')
+    config_path = os.path.join(work_dir, 'catalog_config.json')
+    results["generate_html"] = measure(
+        lambda i: timed(shoprotator.generate_html, shops[i % len(shops)], catalog["featured_images"], html_path,
+                        fragments, localize_images=False),
+        iterations, max_seconds
+    )
+    results["save_to_file"] = measure(
+        lambda i: timed(shoprotator.save_to_file, shops[i % len(shops)], config_path), iterations, max_seconds
+    )
+    webhook_url = f"{stub_url}/api/webhooks/0/benchmark"
+
+    def discord_stage(i):
+        start = time.perf_counter()
+        shoprotator.send_to_discord(webhook_url, shops[i % len(shops)])
+        shoprotator.discord_outbox.flush()
+        return time.perf_counter() - start
+
+    results["send_to_discord"] = measure(discord_stage, iterations, max_seconds)
+    return results
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    regressions = []
+    for size, stages in results.items():
+        for stage, result in stages.items():
+            previous = baseline.get(size, {}).get(stage)
+            if not previous:
+                continue
+            for metric, floor in NOISE_FLOOR.items():
+                if result[metric] > previous[metric] * (1 + tolerance) + floor:
+                    regressions.append(f"{size} {stage} {metric}: {previous[metric]:.2f} -> {result[metric]:.2f}")
+    return regressions
+
+def print_results(results, baseline):
+    print(f"{'size':>7} {'stage':<16} {'iter':>5} {'ops/sec':>10} {'p50 ms':>9} {'p99 ms':>9} {'peak KiB':>10} {'vs base':>8}")
+    for size, stages in results.items():
+        for stage, result in stages.items():
+            previous = baseline.get(size, {}).get(stage)
+            change = f"{(result['p50_ms'] / previous['p50_ms'] - 1) * 100:+.0f}%" if previous and previous["p50_ms"] else ""
+            print(f"{size:>7} {stage:<16} {result['iterations']:>5} {result['ops_per_sec']:>10.1f} "
+                  f"{result['p50_ms']:>9.3f} {result['p99_ms']:>9.3f} {result['peak_kib']:>10.1f} {change:>8}")
+
+def run(sizes=SIZES, iterations=ITERATIONS, max_seconds=MAX_STAGE_SECONDS, baseline_path=BASELINE_FILE,
+        save_baseline=False, tolerance=TOLERANCE):
+    server, stub_url = start_stub_server()
+    results = {}
+    try:
+        for size in sizes:
+            work_dir = tempfile.mkdtemp(prefix=f"shopbench-{size}-")
+            try:
+                # The pipeline's own progress output would drown the report.
+                with contextlib.redirect_stdout(io.StringIO()):
+                    results[str(size)] = run_size(size, work_dir, stub_url, iterations, max_seconds)
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+    finally:
+        server.shutdown()
+
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if save_baseline:
+        with open(baseline_path, 'w') as f:
+            json.dump(results, f, indent=4)
+        print(f"Baseline saved to {baseline_path}")
+        return True
+    regressions = compare(results, baseline, tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return not regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the shop rotation pipeline stage by stage")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="comma-separated synthetic catalog sizes")
+    parser.add_argument("--iterations", type=int, default=ITERATIONS, help="timed runs per stage")
+    parser.add_argument("--max-seconds", type=float, default=MAX_STAGE_SECONDS, help="time budget per stage")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed slowdown before flagging, e.g. 0.25")
+    args = parser.parse_args()
+    ok = run([int(size) for size in args.sizes.split(",")], args.iterations, args.max_seconds, args.baseline,
+             args.save_baseline, args.tolerance)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,82 @@
+import argparse
+import json
+import random
+
+RARITIES = ["rare", "super_rare", "epic", "legendary"]
+# Share of the catalog per cosmetic type, roughly as in catalog_data.json.
+TYPE_SHARES = {"skins": 0.45, "skins_battlepass": 0.05, "emotes": 0.18, "pickaxes": 0.2,
+               "pickaxes_battlepass": 0.02, "gliders": 0.08, "exclusives": 0.02}
+# Only skins come in legendary, like the real tables.
+TYPE_RARITIES = {"skins": RARITIES, "skins_battlepass": RARITIES, "exclusives": RARITIES,
+                 "emotes": RARITIES[:3], "pickaxes": RARITIES[:3], "pickaxes_battlepass": RARITIES[:3], "gliders": RARITIES[:3]}
+SEASONS = 10
+RARITY_SKEW = 1.5
+BACKBLING_SHARE = 0.6
+PAIRS_PER_SEASON = 3
+WORDS = [
+    "Aurora", "Blaze", "Circuit", "Dusk", "Ember", "Frost", "Glimmer", "Harbor", "Ion", "Jade", "Kismet", "Lumen",
+    "Marble", "Nebula", "Onyx", "Prism", "Quartz", "Rogue", "Solstice", "Tundra", "Umbra", "Vortex", "Warden", "Xenon",
+    "Yonder", "Zephyr", "Bunny", "Carrot", "Disco", "Pajama", "Reaper", "Stripe", "Tactical", "Werewolf", "Zombie",
+]
+
+def item_id(kind, number, rng):
+    word = rng.choice(WORDS)
+    if kind in ("skins", "skins_battlepass", "exclusives"):
+        return f"CID_{number:03d}_Athena_Commando_{rng.choice('MF')}_{word}"
+    if kind == "emotes":
+        return f"EID_{word}{number}"
+    if kind in ("pickaxes", "pickaxes_battlepass"):
+        return f"Pickaxe_ID_{number:03d}_{word}"
+    return f"Glider_ID_{number:03d}_{word}"
+
+def generate_catalog(size, seasons=SEASONS, rarity_skew=RARITY_SKEW, seed=0, type_shares=TYPE_SHARES,
+                     backbling_share=BACKBLING_SHARE, pairs_per_season=PAIRS_PER_SEASON):
+    # Same layout as catalog_data.json (string season keys, lists of pairs) and
+    # the id prefixes identify_category understands. rarity_skew is how much
+    # rarer each tier is than the one below it: 1 spreads items evenly.
+    rng = random.Random(seed)
+    catalog = {
+        "skins_by_season": {}, "skins_battlepass_by_season": {}, "emotes_by_season": {}, "pickaxes_by_season": {},
+        "pickaxes_battlepass_by_season": {}, "gliders_by_season": {}, "exclusive_items": {rarity: [] for rarity in RARITIES},
+        "backbling_mapping": {}, "paired_featured_items": {}, "featured_images": {}
+    }
+    skins_by_season = {}
+    number = 0
+    for kind, share in type_shares.items():
+        rarities = TYPE_RARITIES[kind]
+        weights = [rarity_skew ** -tier for tier in range(len(rarities))]
+        for _ in range(round(size * share)):
+            number += 1
+            item = item_id(kind, number, rng)
+            rarity = rng.choices(rarities, weights)[0]
+            season = rng.randint(1, seasons)
+            if kind == "exclusives":
+                catalog["exclusive_items"][rarity].append(item)
+            else:
+                catalog[f"{kind}_by_season"].setdefault(str(season), {}).setdefault(rarity, []).append(item)
+            if item.startswith("CID_"):
+                if rng.random() < backbling_share:
+                    catalog["backbling_mapping"][item] = f"BID_{number:03d}_{item.rsplit('_', 1)[1]}"
+                if kind == "skins":
+                    skins_by_season.setdefault(season, []).append(item)
+    for season, skins in sorted(skins_by_season.items()):
+        if len(skins) < 2:
+            continue
+        pairs = [rng.sample(skins, 2) for _ in range(pairs_per_season)]
+        catalog["paired_featured_items"][str(season)] = pairs
+        for item in (item for pair in pairs for item in pair):
+            catalog["featured_images"][item] = f"https://fortnite.gg/img/items/{item}/featured.png"
+    return catalog
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic cosmetics catalog for load testing")
+    parser.add_argument("size", type=int, help="number of cosmetics")
+    parser.add_argument("-o", "--output", default="catalog_synthetic.json", help="where to write the catalog JSON")
+    parser.add_argument("--seasons", type=int, default=SEASONS, help="number of seasons to spread items over")
+    parser.add_argument("--rarity-skew", type=float, default=RARITY_SKEW, help="how much rarer each rarity tier is than the last")
+    parser.add_argument("--seed", type=int, default=0, help="random seed; the same seed gives the same catalog")
+    args = parser.parse_args()
+    catalog = generate_catalog(args.size, args.seasons, args.rarity_skew, args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(catalog, f, indent=4)
+    print(f"Catalog with {args.size} cosmetics over {args.seasons} seasons saved to {args.output}")
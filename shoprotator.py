@@ -1,8 +1,419 @@
+import argparse
+import glob
+import gzip
+import hashlib
+import itertools
 import json
+import logging
+import mimetypes
 import os
+import pickle
 import random
+import signal
+import sqlite3
+import sys
+import threading
+import time
 import requests
-from datetime import datetime
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+CATALOG_FILE = os.path.join(os.path.dirname(__file__), 'catalog_data.json')
+CONFIG_FILE = os.path.join(os.path.dirname(__file__), 'catalog_config.json')
+HTML_FILE = os.path.join(os.path.dirname(__file__), 'item_shop.html')
+FRAGMENTS_FILE = os.path.join(os.path.dirname(__file__), 'item_shop.fragments.json')
+OUTBOX_DIR = os.path.join(os.path.dirname(__file__), 'discord_outbox')
+METADATA_DB = os.path.join(os.path.dirname(__file__), 'cosmetics.db')
+HISTORY_DB = os.path.join(os.path.dirname(__file__), 'rotation_history.db')
+IMAGES_DIR = os.path.join(os.path.dirname(__file__), 'images')
+IMAGE_CACHE_DIR = os.path.join(IMAGES_DIR, 'cache')
+ROTATIONS_FILE = os.path.join(os.path.dirname(__file__), 'rotations.jsonl')
+NAME_CACHE_FILE = os.path.join(os.path.dirname(__file__), 'item_names.jsonl')
+NAME_CACHE_MAX_SIZE = 10000
+NAME_CACHE_TTL = 30 * 24 * 60 * 60
+FORTNITE_API_URL = "https://fortnite-api.com"
+NAME_FETCH_WORKERS = 8
+OFFLINE = False
+METRICS_FILE = None
+LOCALIZE_IMAGES = True
+THUMBNAIL_SIZE = 256
+
+HTTP_POOL_SIZE = 16
+HTTP_DEFAULT_TIMEOUT = (3.05, 10)
+HTTP_TIMEOUTS = {
+    "fortnite-api.com": (3.05, 10),
+    "discord.com": (3.05, 15),
+}
+HTTP_MAX_RETRIES = 4
+HTTP_BACKOFF_BASE = 0.5
+HTTP_BACKOFF_MAX = 30
+HTTP_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+DISCORD_MAX_EMBEDS = 10
+DISCORD_MAX_FIELDS = 25
+DISCORD_MAX_EMBED_CHARS = 6000
+OUTBOX_FLUSH_TIMEOUT = 30
+# Connection errors and 5xx responses per target, and message age in seconds,
+# after which a delivery is given up and moved to failed.jsonl.
+OUTBOX_MAX_ATTEMPTS = 6
+OUTBOX_MAX_AGE = 12 * 3600
+DISCORD_WORKERS = HTTP_POOL_SIZE
+
+CURRENT_SEASON = 6
+COOLDOWN_DAYS = 7
+ROTATE_AT = "00:00"
+SERVE_HOST = "127.0.0.1"
+EVENTS_KEEPALIVE = 15
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+RARITY_WEIGHTS = {"rare": 1, "super_rare": 1, "epic": 1, "legendary": 1}
+
+PRICE_MAPPING = {
+    "AthenaCharacter": {
+        "rare": 800,
+        "super_rare": 1200,
+        "epic": 1500,
+        "legendary": 2000
+    },
+    "AthenaDance": {
+        "rare": 200,
+        "super_rare": 500,
+        "epic": 800
+    },
+    "AthenaPickaxe": {
+        "rare": 500,
+        "super_rare": 800,
+        "epic": 1200
+    }
+}
+
+ItemRecord = namedtuple("ItemRecord", ["rarity", "category", "season", "backbling"])
+CosmeticInfo = namedtuple("CosmeticInfo", ["id", "name", "rarity", "series", "type", "icon", "small_icon", "featured"])
+
+# fortnite-api.com rarity values -> the rarity names used by the shop tables.
+API_RARITIES = {"uncommon": "rare", "rare": "super_rare", "epic": "epic", "legendary": "legendary"}
+ItemPool = namedtuple("ItemPool", ["combined_items", "index", "records"])
+ShopCard = namedtuple("ShopCard", ["slot", "kind", "item_data", "cid", "img_url", "key", "section"])
+LayoutSection = namedtuple("LayoutSection", ["name", "style", "slots", "rarity_weights", "paired"])
+Tenant = namedtuple("Tenant", [
+    "name", "current_season", "include_battle_pass", "include_exclusives", "more_accurate", "webhooks", "output_dir",
+    "layout", "history", "fragments"
+])
+ServedFile = namedtuple("ServedFile", ["content_type", "etag", "bodies"])
+
+# Bump whenever featured_item_html/daily_item_html change, so cached card
+# fragments rendered by the old templates are not reused.
+CARD_TEMPLATE_VERSION = 1
+
+LAYOUT_CATEGORIES = {"AthenaCharacter", "AthenaBackpack", "AthenaPickaxe", "AthenaGlider", "AthenaDance"}
+CARD_STYLES = {"card", "sub-card"}
+
+def compile_layout(raw):
+    # {"sections": [...]} -> tuple of LayoutSection, in page order. A section's
+    # "slots" is either a count, with every slot drawing from "categories", or
+    # a list giving each slot's category (or list of categories). Slot n of
+    # section "daily" is the shop entry "daily<n>". "paired" sections are
+    # filled from paired_featured_items two slots at a time in more_accurate mode.
+    sections = raw.get("sections") if isinstance(raw, dict) else None
+    if not sections:
+        raise ValueError('Layout needs a non-empty "sections" list')
+    compiled = []
+    names = set()
+    for section in sections:
+        name = section.get("name")
+        if not isinstance(name, str) or not name.isidentifier() or name in names:
+            raise ValueError(f"Layout section names must be unique identifiers, got {name!r}")
+        names.add(name)
+        style = section.get("style", "sub-card")
+        if style not in CARD_STYLES:
+            raise ValueError(f"Section {name}: style must be one of {sorted(CARD_STYLES)}, got {style!r}")
+        slots = section.get("slots")
+        if isinstance(slots, int) and not isinstance(slots, bool):
+            slots = [section.get("categories")] * slots
+        if not isinstance(slots, list) or not slots:
+            raise ValueError(f"Section {name}: slots must be a positive count or a list of categories")
+        compiled_slots = []
+        for categories in slots:
+            if isinstance(categories, str):
+                categories = [categories]
+            if not isinstance(categories, list) or not categories or not LAYOUT_CATEGORIES.issuperset(categories):
+                raise ValueError(f"Section {name}: slot categories must come from {sorted(LAYOUT_CATEGORIES)}, got {categories!r}")
+            compiled_slots.append(tuple(categories))
+        rarity_weights = section.get("rarity_weights", RARITY_WEIGHTS)
+        if not isinstance(rarity_weights, dict) or not all(
+            rarity in RARITY_WEIGHTS and isinstance(weight, (int, float)) and weight >= 0
+            for rarity, weight in rarity_weights.items()
+        ):
+            raise ValueError(f"Section {name}: rarity_weights must map {sorted(RARITY_WEIGHTS)} to non-negative numbers")
+        compiled.append(LayoutSection(name, style, tuple(compiled_slots), rarity_weights, bool(section.get("paired", False))))
+    return tuple(compiled)
+
+def load_layout(path):
+    with open(path) as f:
+        return compile_layout(json.load(f))
+
+DEFAULT_LAYOUT = compile_layout({"sections": [
+    {"name": "featured", "style": "card", "slots": 2, "categories": ["AthenaCharacter"], "paired": True},
+    {"name": "daily", "style": "sub-card", "slots": [
+        "AthenaDance", "AthenaPickaxe", "AthenaCharacter", "AthenaPickaxe", "AthenaDance", "AthenaDance"
+    ]},
+]})
+
+log = logging.getLogger("shoprotator")
+
+class JsonLogFormatter(logging.Formatter):
+    # One JSON object per line; structured fields ride along in extra={"fields": ...}.
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging(stream=sys.stderr):
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonLogFormatter())
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+
+class Metrics:
+    # Process-wide counters and latency histograms, rendered in the Prometheus
+    # text format. A series is its name plus its sorted label pairs.
+    def __init__(self, buckets=METRICS_BUCKETS):
+        self.buckets = buckets
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted((label, str(v)) for label, v in labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted((label, str(v)) for label, v in labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+
+    def render(self):
+        def series(name, labels, value):
+            text = ",".join(
+                '{}="{}"'.format(label, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                for label, v in labels
+            )
+            return f"shop_{name}{{{text}}} {value}" if text else f"shop_{name} {value}"
+
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, {**h, "buckets": list(h["buckets"])}) for key, h in self.histograms.items())
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE shop_{name} counter")
+            lines.append(series(name, labels, value))
+        for (name, labels), histogram in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE shop_{name} histogram")
+            for bound, count in zip(self.buckets, histogram["buckets"]):
+                lines.append(series(f"{name}_bucket", labels + (("le", str(bound)),), count))
+            lines.append(series(f"{name}_bucket", labels + (("le", "+Inf"),), histogram["count"]))
+            lines.append(series(f"{name}_sum", labels, round(histogram["sum"], 6)))
+            lines.append(series(f"{name}_count", labels, histogram["count"]))
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # For node_exporter's textfile collector, which must never see a partial file.
+        write_atomic(path, lambda f: f.write(self.render()))
+
+metrics = Metrics()
+
+@contextmanager
+def span(name, **fields):
+    # Times one pipeline stage: recorded in the shop_stage_seconds histogram
+    # and logged as a single structured event. The block may add fields.
+    start = time.perf_counter()
+    error = None
+    try:
+        yield fields
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe("stage_seconds", elapsed, stage=name)
+        if error:
+            fields["error"] = error
+        log.info("span", extra={"fields": {"span": name, "duration_ms": round(elapsed * 1000, 3), **fields}})
+
+_catalogs = {}
+
+def compile_catalog(raw):
+    # JSON only has string keys and lists; restore int seasons and pair tuples.
+    catalog = {}
+    for name, table in raw.items():
+        if name.endswith("_by_season"):
+            catalog[name] = {int(season): rarities for season, rarities in table.items()}
+        elif name == "paired_featured_items":
+            catalog[name] = {int(season): [tuple(pair) for pair in pairs] for season, pairs in table.items()}
+        else:
+            catalog[name] = table
+    return catalog
+
+def load_catalog(path=CATALOG_FILE):
+    # The JSON source is compiled to a pickle next to it, tagged with the
+    # source's hash, and only recompiled when the source content changes.
+    if path in _catalogs:
+        metrics.inc("cache_hits_total", cache="catalog")
+        return _catalogs[path]
+    with open(path, 'rb') as f:
+        source = f.read()
+    digest = hashlib.sha256(source).hexdigest()
+    compiled_path = os.path.splitext(path)[0] + '.pickle'
+    catalog = None
+    try:
+        with open(compiled_path, 'rb') as f:
+            compiled = pickle.load(f)
+        if compiled.get("hash") == digest:
+            catalog = compiled["catalog"]
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, KeyError):
+        catalog = None
+    if catalog is None:
+        metrics.inc("cache_misses_total", cache="catalog")
+        catalog = compile_catalog(json.loads(source))
+        compiled = {"hash": digest, "catalog": catalog}
+        write_atomic(compiled_path, lambda f: pickle.dump(compiled, f, protocol=pickle.HIGHEST_PROTOCOL), 'wb')
+    else:
+        metrics.inc("cache_hits_total", cache="catalog")
+    _catalogs[path] = catalog
+    return catalog
+
+class HttpClient:
+    # One pooled keep-alive session for every outbound call. Requests get a
+    # per-host (connect, read) timeout and 429/5xx responses are retried with
+    # full-jitter exponential backoff, preferring the server's Retry-After.
+    def __init__(self, timeouts=HTTP_TIMEOUTS, default_timeout=HTTP_DEFAULT_TIMEOUT, max_retries=HTTP_MAX_RETRIES,
+                 backoff_base=HTTP_BACKOFF_BASE, backoff_max=HTTP_BACKOFF_MAX, pool_size=HTTP_POOL_SIZE):
+        self.timeouts = timeouts
+        self.default_timeout = default_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = random.Random()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def timeout_for(self, url):
+        host = urlsplit(url).hostname or ""
+        while host:
+            if host in self.timeouts:
+                return self.timeouts[host]
+            host = host.partition(".")[2]
+        return self.default_timeout
+
+    def backoff(self, attempt):
+        return self.jitter.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def retry_after(self, response):
+        value = response.headers.get("Retry-After")
+        if value is None and response.status_code == 429:
+            try:
+                value = response.json().get("retry_after")
+            except ValueError:
+                value = None
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+    def record(self, method, host, status, started, attempt):
+        # Only the host is recorded: webhook URLs carry their token in the path.
+        elapsed = time.perf_counter() - started
+        metrics.observe("http_request_seconds", elapsed, host=host, method=method)
+        metrics.inc("http_requests_total", host=host, method=method, status=status)
+        log.info("http", extra={"fields": {
+            "method": method, "host": host, "status": status, "attempt": attempt, "duration_ms": round(elapsed * 1000, 3)
+        }})
+
+    def request(self, method, url, max_retries=None, **kwargs):
+        kwargs.setdefault("timeout", self.timeout_for(url))
+        max_retries = self.max_retries if max_retries is None else max_retries
+        host = urlsplit(url).hostname or ""
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.record(method, host, type(e).__name__, started, attempt)
+                if attempt >= max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                metrics.inc("http_retries_total", host=host)
+                metrics.inc("http_backoff_seconds_total", delay, host=host)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.record(method, host, response.status_code, started, attempt)
+            if response.status_code not in HTTP_RETRY_STATUSES or attempt >= max_retries:
+                return response
+            delay = self.retry_after(response)
+            if delay is None:
+                delay = self.backoff(attempt)
+            elif delay > self.backoff_max:
+                # Retrying before the server allows it would only be refused;
+                # hand the response back rather than wait that long.
+                return response
+            response.close()
+            metrics.inc("http_retries_total", host=host)
+            metrics.inc("http_backoff_seconds_total", delay, host=host)
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+http_client = HttpClient()
 
 def identify_category(cid):
     if cid and cid.startswith("CID_"):
@@ -18,49 +429,91 @@ def identify_category(cid):
     else:
         return None, cid
 
-def get_price(cid, rarity):
-    price_mapping = {
-        "AthenaCharacter": {
-            "rare": 800,
-            "super_rare": 1200,
-            "epic": 1500,
-            "legendary": 2000
-        },
-        "AthenaDance": {
-            "rare": 200,
-            "super_rare": 500,
-            "epic": 800
-        },
-        "AthenaPickaxe": {
-            "rare": 500,
-            "super_rare": 800,
-            "epic": 1200
-        }
-    }
-    
-    type, _ = identify_category(cid)
-    return price_mapping.get(type, {}).get(rarity, random.randint(200, 2000))
+def get_price(cid, rarity, type=None, rng=None):
+    rng = rng or random
+    if type is None:
+        type, _ = identify_category(cid)
+    price = PRICE_MAPPING.get(type, {}).get(rarity)
+    if price is None:
+        price = rng.randint(200, 2000)
+    return price
+
+def combine_items(catalog, current_season, include_battle_pass, include_exclusives):
+    combined_items = {"rare": [], "super_rare": [], "epic": [], "legendary": []}
+    combined_bp_items = {"rare": [], "super_rare": [], "epic": [], "legendary": []}
+    combined_exclusive_items = {"rare": [], "super_rare": [], "epic": [], "legendary": []}
+    item_seasons = {}
+
+    def extend(target, table, season):
+        for rarity, items in table[season].items():
+            target[rarity].extend(items)
+            for item in items:
+                item_seasons.setdefault(item, season)
+
+    for season in range(1, current_season + 1):
+        if season in catalog["skins_by_season"]:
+            extend(combined_items, catalog["skins_by_season"], season)
+        if include_battle_pass and season in catalog["skins_battlepass_by_season"]:
+            extend(combined_bp_items, catalog["skins_battlepass_by_season"], season)
+        if season in catalog["emotes_by_season"]:
+            extend(combined_items, catalog["emotes_by_season"], season)
+        if season in catalog["pickaxes_by_season"]:
+            extend(combined_items, catalog["pickaxes_by_season"], season)
+        if season in catalog.get("gliders_by_season", {}):
+            extend(combined_items, catalog["gliders_by_season"], season)
+        if include_battle_pass and season in catalog["pickaxes_battlepass_by_season"]:
+            extend(combined_bp_items, catalog["pickaxes_battlepass_by_season"], season)
+
+    if include_battle_pass:
+        for rarity in combined_bp_items:
+            combined_items[rarity].extend(combined_bp_items[rarity])
 
-def add_items(items_dict, rarity_mapping, backbling_mapping):
+    if include_exclusives:
+        for rarity, items in catalog["exclusive_items"].items():
+            combined_exclusive_items[rarity].extend(items)
+
+    return combined_items, item_seasons
+
+def build_item_records(combined_items, item_seasons, backbling_mapping):
+    # cid -> ItemRecord. An item listed under several rarities keeps the first
+    # one in rarity order, matching the old linear scan in add_items.
+    records = {}
+    for rarity, items in combined_items.items():
+        for cid in items:
+            if cid not in records:
+                records[cid] = ItemRecord(rarity, identify_category(cid)[0], item_seasons.get(cid), backbling_mapping.get(cid))
+    return records
+
+def build_item_pool(catalog, current_season, include_battle_pass, include_exclusives):
+    combined_items, item_seasons = combine_items(catalog, current_season, include_battle_pass, include_exclusives)
+    return ItemPool(
+        combined_items,
+        ItemIndex(combined_items),
+        build_item_records(combined_items, item_seasons, catalog["backbling_mapping"])
+    )
+
+def add_items(items_dict, item_records, rng=None):
     items = {}
     for category, cid in items_dict.items():
         if cid is None:
             continue
         if isinstance(cid, dict):
             cid = cid['itemGrants'][0].split(":")[1]
-        rarity = None
-        for rarity_level, item_ids in rarity_mapping.items():
-            if cid in item_ids:
-                rarity = rarity_level
-                break
-        price = get_price(cid, rarity)
-        type, full_type = identify_category(cid)
+        record = item_records.get(cid)
+        if record:
+            rarity, type, backbling = record.rarity, record.category, record.backbling
+        else:
+            info = cosmetic_metadata.get(cid)
+            rarity = API_RARITIES.get(info.rarity) if info else None
+            type, backbling = identify_category(cid)[0], None
+        price = get_price(cid, rarity, type, rng)
+        full_type = cid
         if type:
             items[category] = {}
-            if type == "AthenaCharacter" and rarity in ["super_rare", "epic", "legendary"] and cid in backbling_mapping:
+            if type == "AthenaCharacter" and rarity in ["super_rare", "epic", "legendary"] and backbling:
                 items[category]["itemGrants"] = [
                     f"{type}:{full_type}", 
-                    f"AthenaBackpack:{backbling_mapping[cid]}"
+                    f"AthenaBackpack:{backbling}"
                 ]
             else:
                 items[category]["itemGrants"] = [f"{type}:{full_type}"]
@@ -68,94 +521,679 @@ def add_items(items_dict, rarity_mapping, backbling_mapping):
             items[category]["rarity"] = rarity
     return items
 
-def save_to_file(shop):
-    file_path = os.path.join(os.path.dirname(__file__), 'catalog_config.json')
-    with open(file_path, 'w') as f:
-        json.dump(shop, f, indent=4)
+def save_to_file(shop, file_path=None):
+    # The game backend may read the config at any moment; never let it see a
+    # truncated file. Defaults are looked up per call so CONFIG_FILE can be
+    # repointed at runtime.
+    file_path = file_path or CONFIG_FILE
+    write_atomic(file_path, lambda f: json.dump(shop, f, indent=4), durable=True)
     print(f"\nConfiguration saved to {file_path}")
 
-def get_random_item(rarity, category, used_items, combined_items):
-    available_items = [item for item in combined_items[rarity] if identify_category(item)[0] == category and item not in used_items]
-    if not available_items:
+class RotationHistory:
+    # Append-only log of every published rotation. Each shop is stored once as
+    # compact JSON, and every granted item gets an appearance row indexed by
+    # item and by date, so "when was X last in the shop?" is an index lookup.
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        self.connection = None
+        self.lock = threading.Lock()
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            with self.connection:
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS rotations (id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT NOT NULL, "
+                    "published REAL NOT NULL, shop TEXT NOT NULL)"
+                )
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS appearances (rotation INTEGER NOT NULL REFERENCES rotations(id), "
+                    "item TEXT NOT NULL COLLATE NOCASE, date TEXT NOT NULL, slot TEXT NOT NULL)"
+                )
+                self.connection.execute("CREATE INDEX IF NOT EXISTS rotations_date ON rotations (date)")
+                self.connection.execute("CREATE INDEX IF NOT EXISTS appearances_item ON appearances (item, date)")
+                self.connection.execute("CREATE INDEX IF NOT EXISTS appearances_date ON appearances (date)")
+        return self.connection
+
+    def record(self, rotation_date, shop):
+        appearances = [
+            (grant.split(":", 1)[-1], slot)
+            for slot, data in shop.items()
+            for grant in data["itemGrants"]
+        ]
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                rotation = connection.execute(
+                    "INSERT INTO rotations (date, published, shop) VALUES (?, ?, ?)",
+                    (rotation_date.isoformat(), time.time(), json.dumps(shop, separators=(",", ":")))
+                ).lastrowid
+                connection.executemany(
+                    "INSERT INTO appearances (rotation, item, date, slot) VALUES (?, ?, ?, ?)",
+                    [(rotation, item, rotation_date.isoformat(), slot) for item, slot in appearances]
+                )
+        return rotation
+
+    def last_seen(self, item):
+        item = item.split(":", 1)[-1]
+        with self.lock:
+            row = self.connect().execute("SELECT MAX(date) FROM appearances WHERE item = ?", (item,)).fetchone()
+        return date.fromisoformat(row[0]) if row[0] else None
+
+    def items_since(self, since_date):
+        with self.lock:
+            rows = self.connect().execute(
+                "SELECT DISTINCT item FROM appearances WHERE date >= ?", (since_date.isoformat(),)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def shop_on(self, rotation_date):
+        # Latest rotation published for that date (a manual rotation may add more than one).
+        with self.lock:
+            row = self.connect().execute(
+                "SELECT shop FROM rotations WHERE date = ? ORDER BY id DESC LIMIT 1", (rotation_date.isoformat(),)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+rotation_history = RotationHistory()
+
+class ItemIndex:
+    # Candidate pools keyed by (rarity, category), built once per item pool.
+    # Each bucket keeps its drawable items in bucket[:active]; drawing swaps
+    # the pick past that boundary so draws without replacement are O(1).
+    # Every swap is logged so reset() can restore the exact built order.
+    # Items on cooldown are parked aside as they come up and only released
+    # back into their bucket when a slot can't be filled otherwise.
+    def __init__(self, combined_items):
+        self.buckets = {}
+        self.positions = {}
+        self.log = []
+        for rarity, items in combined_items.items():
+            for item in items:
+                key = (rarity, identify_category(item)[0])
+                bucket = self.buckets.setdefault(key, [])
+                positions = self.positions.setdefault(key, {})
+                if item in positions:
+                    continue
+                positions[item] = len(bucket)
+                bucket.append(item)
+        self.active = {key: len(bucket) for key, bucket in self.buckets.items()}
+        self.cooled = {}
+
+    def size(self, rarity, category):
+        return self.active.get((rarity, category), 0)
+
+    def swap(self, key, pos, last):
+        bucket = self.buckets[key]
+        positions = self.positions[key]
+        item, other = bucket[pos], bucket[last]
+        bucket[pos], bucket[last] = other, item
+        positions[other], positions[item] = pos, last
+
+    def park(self, key, pos):
+        last = self.active[key] - 1
+        self.swap(key, pos, last)
+        self.active[key] = last
+        self.log.append((key, pos, False))
+
+    def unpark(self, key, pos):
+        first = self.active[key]
+        self.swap(key, pos, first)
+        self.active[key] = first + 1
+        self.log.append((key, pos, True))
+
+    def reset(self):
+        while self.log:
+            key, pos, unparked = self.log.pop()
+            if unparked:
+                self.active[key] -= 1
+                self.swap(key, pos, self.active[key])
+            else:
+                self.swap(key, pos, self.active[key])
+                self.active[key] += 1
+        self.cooled.clear()
+
+    def draw(self, rarity, category, used_items, rng=random, cooldown=frozenset()):
+        key = (rarity, category)
+        draws = 0
+        try:
+            while self.active.get(key, 0):
+                draws += 1
+                pos = rng.randrange(self.active[key])
+                item = self.buckets[key][pos]
+                self.park(key, pos)
+                if item in used_items:
+                    continue
+                if item in cooldown:
+                    self.cooled.setdefault(key, []).append(item)
+                    metrics.inc("selection_cooled_total", category=category)
+                    continue
+                return item
+            return None
+        finally:
+            metrics.inc("selection_draws_total", draws, category=category)
+
+    def release(self, category):
+        # Put the cooled items of every rarity in category back into play.
+        released = 0
+        for key in [key for key in self.cooled if key[1] == category]:
+            for item in self.cooled.pop(key):
+                self.unpark(key, self.positions[key][item])
+                released += 1
+        return released
+
+def get_random_item(rarity, category, used_items, item_index, rng=None, cooldown=frozenset()):
+    # Items used elsewhere (e.g. another rarity's bucket) or shown within the
+    # cooldown window are skipped lazily, with one set lookup each.
+    selected_item = item_index.draw(rarity, category, used_items, rng or random, cooldown)
+    if selected_item is None:
         return None
-    selected_item = random.choice(available_items)
     used_items.add(selected_item)
     return selected_item
 
-def ensure_non_none_items(num_items, category, used_items, combined_items):
+def ensure_non_none_items(num_items, category, used_items, item_index, rarity_weights=None, rng=None, cooldown=frozenset(),
+                          release=True):
+    # Pick a rarity by weight among the buckets that still have candidates,
+    # then draw from it. Every failed draw empties a bucket, so this always
+    # terminates with exactly num_items items or raises. If only items on
+    # cooldown are left, they are released and drawn rather than failing,
+    # unless release is False.
+    rarity_weights = rarity_weights or RARITY_WEIGHTS
+    rng = rng or random
     items = []
-    retries = 0
-    max_retries = 10
-    while len(items) < num_items and retries < max_retries:
-        item = get_random_item(random.choice(["rare", "super_rare", "epic", "legendary"]), category, used_items, combined_items)
+    while len(items) < num_items:
+        rarities = [rarity for rarity, weight in rarity_weights.items() if weight > 0 and item_index.size(rarity, category)]
+        if not rarities and cooldown and release and item_index.release(category):
+            cooldown = frozenset()
+            continue
+        if not rarities:
+            raise ValueError(f"Not enough {category} items to fill {num_items} slots (found {len(items)})")
+        rarity = rng.choices(rarities, weights=[rarity_weights[rarity] for rarity in rarities])[0]
+        item = get_random_item(rarity, category, used_items, item_index, rng, cooldown)
         if item:
             items.append(item)
-        retries += 1
     return items
 
-def get_paired_featured_items(pairs, used_items, combined_items):
+def get_paired_featured_items(pairs, used_items, combined_items, rng=None, cooldown=frozenset()):
     available_pairs = [pair for pair in pairs if pair[0] not in used_items and pair[1] not in used_items]
+    fresh_pairs = [pair for pair in available_pairs if pair[0] not in cooldown and pair[1] not in cooldown]
+    available_pairs = fresh_pairs or available_pairs
     if not available_pairs:
         return None, None
-    selected_pair = random.choice(available_pairs)
+    selected_pair = (rng or random).choice(available_pairs)
     used_items.update(selected_pair)
     return selected_pair
 
-def send_to_discord(webhook_url, shop_data):
+def discord_embeds(shop_data, layout=DEFAULT_LAYOUT):
+    # One field per layout slot and DISCORD_MAX_FIELDS fields per embed; the
+    # header goes on the first embed and the banner and footer on the last.
     date_str = datetime.now().strftime("%d/%m/%Y")
     
     def format_item(item):
         return item.split(":")[1] if ":" in item else item
 
-    embed = {
-        "author": {
-            "name": f"ITEM SHOP {date_str}",
-            "url": "",
-        },
-        "fields": [
-            {"name": "featured 1", "value": format_item(shop_data.get('featured1', {}).get('itemGrants', [''])[0]), "inline": True},
-            {"name": "featured 2", "value": format_item(shop_data.get('featured2', {}).get('itemGrants', [''])[0]), "inline": True},
-            {"name": "daily 1", "value": format_item(shop_data.get('daily1', {}).get('itemGrants', [''])[0]), "inline": True},
-            {"name": "daily 2", "value": format_item(shop_data.get('daily2', {}).get('itemGrants', [''])[0]), "inline": True},
-            {"name": "daily 3", "value": format_item(shop_data.get('daily3', {}).get('itemGrants', [''])[0]), "inline": True},
-            {"name": "daily 4", "value": format_item(shop_data.get('daily4', {}).get('itemGrants', [''])[0]), "inline": True},
-            {"name": "daily 5", "value": format_item(shop_data.get('daily5', {}).get('itemGrants', [''])[0]), "inline": True},
-            {"name": "daily 6", "value": format_item(shop_data.get('daily6', {}).get('itemGrants', [''])[0]), "inline": True},
-        ],
-        "image": {
-            "url": "https://cdn.discordapp.com/attachments/12526c03916808a417a7336fc2350c328016be93daccc&"
-        },
-        "color": 0xffffff,
-        "footer": {
-            "text": "Item shop",
-            "icon_url": "https://cdn.discordapp.com/attachments/12526c03916808a417a7336fc2350c328016be93daccc&"
-        }
-    }
-
-    data = {
-        "embeds": [embed]
-    }
-
-    response = requests.post(webhook_url, json=data)
-
-    if response.status_code == 204:
-        print("Message sent successfully")
+    fields = [
+        {"name": f"{section.name} {i}", "value": format_item(shop_data.get(f"{section.name}{i}", {}).get('itemGrants', [''])[0]), "inline": True}
+        for section in layout
+        for i in range(1, len(section.slots) + 1)
+    ]
+    chunks = [fields[i:i + DISCORD_MAX_FIELDS] for i in range(0, len(fields), DISCORD_MAX_FIELDS)]
+    embeds = []
+    for n, chunk in enumerate(chunks):
+        embed = {}
+        if n == 0:
+            embed["author"] = {
+                "name": f"ITEM SHOP {date_str}",
+                "url": "",
+            }
+        embed["fields"] = chunk
+        if n == len(chunks) - 1:
+            embed["image"] = {
+                "url": "https://cdn.discordapp.com/attachments/12526c03916808a417a7336fc2350c328016be93daccc&"
+            }
+        embed["color"] = 0xffffff
+        if n == len(chunks) - 1:
+            embed["footer"] = {
+                "text": "Item shop",
+                "icon_url": "https://cdn.discordapp.com/attachments/12526c03916808a417a7336fc2350c328016be93daccc&"
+            }
+        embeds.append(embed)
+
+    return embeds
+
+def discord_batch(queued):
+    # Discord takes at most DISCORD_MAX_EMBEDS embeds and DISCORD_MAX_EMBED_CHARS
+    # characters of embed text per message; the serialized length
+    # over-estimates the latter, so a batch built from it is always accepted.
+    batch = []
+    size = 0
+    for path, embed in queued[:DISCORD_MAX_EMBEDS]:
+        size += len(embed)
+        if batch and size > DISCORD_MAX_EMBED_CHARS:
+            break
+        batch.append((path, embed))
+    return batch
+
+def webhook_label(webhook_url):
+    # Webhook URLs embed their secret token; only show the webhook id.
+    parts = urlsplit(webhook_url).path.rstrip("/").split("/")
+    return f"{urlsplit(webhook_url).hostname}/{parts[-2] if len(parts) >= 2 else parts[-1]}"
+
+class DiscordOutbox:
+    # Webhook deliveries spooled to disk until Discord acknowledges them. A
+    # message is serialized once and lists every target it still has to
+    # reach. A background thread sends to all targets concurrently, merging
+    # queued embeds for the same webhook into one request (up to
+    # DISCORD_MAX_EMBEDS) and holding a webhook back while its rate-limit
+    # bucket is empty or after a failure. Failed attempts are kept in the
+    # spool file so retries stay bounded across restarts.
+    def __init__(self, directory=OUTBOX_DIR, workers=DISCORD_WORKERS):
+        self.directory = directory
+        self.workers = workers
+        self.blocked_until = {}
+        self.failures = {}
+        self.stats = {}
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.idle = threading.Condition()
+        self.thread = None
+
+    def enqueue(self, webhook_urls, embed):
+        if isinstance(webhook_urls, str):
+            webhook_urls = [webhook_urls]
+        os.makedirs(self.directory, exist_ok=True)
+        message = {"targets": list(dict.fromkeys(webhook_urls)), "embed": json.dumps(embed, separators=(",", ":")),
+                   "created": time.time()}
+        name = f"{time.time_ns():020d}-{os.getpid()}-{next(self.counter)}.json"
+        write_atomic(os.path.join(self.directory, name), lambda f: json.dump(message, f))
+        self.start()
+        self.wake.set()
+
+    def pending(self):
+        messages = []
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.json"))):
+            try:
+                with open(path) as f:
+                    message = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if "webhook" in message:
+                message = {"targets": [message["webhook"]], "embed": json.dumps(message["embed"], separators=(",", ":"))}
+            if "created" not in message:
+                try:
+                    message["created"] = os.path.getmtime(path)
+                except OSError:
+                    continue
+            messages.append((path, message))
+        return messages
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                self.wake.clear()
+                wait = self.deliver_pending(executor)
+                if wait is None:
+                    with self.idle:
+                        self.idle.notify_all()
+                self.wake.wait(wait if wait is not None else 60)
+
+    def deliver_pending(self, executor):
+        # One round: at most one request per target, all in flight at once.
+        # Returns how long to sleep before the next round, or None when
+        # nothing is left to send.
+        messages = self.pending()
+        done = {}
+        given_up = {}
+        by_target = {}
+        for path, message in messages:
+            if time.time() - message["created"] > OUTBOX_MAX_AGE:
+                for webhook_url in message["targets"]:
+                    given_up.setdefault((webhook_url, "expired"), []).append(message["embed"])
+                done[path] = set(message["targets"])
+                continue
+            for webhook_url in message["targets"]:
+                by_target.setdefault(webhook_url, []).append((path, message["embed"]))
+        wait = 60 if by_target else None
+        futures = []
+        for webhook_url, queued in by_target.items():
+            now = time.monotonic()
+            blocked_until = self.blocked_until.get(webhook_url, 0)
+            if blocked_until > now:
+                wait = min(wait, blocked_until - now)
+                continue
+            futures.append(executor.submit(self.deliver, webhook_url, discord_batch(queued)))
+            wait = 0
+        messages_by_path = dict(messages)
+        retried = set()
+        for future in futures:
+            webhook_url, finished, failed, status = future.result()
+            for path in finished:
+                done.setdefault(path, set()).add(webhook_url)
+            for path in failed:
+                message = messages_by_path[path]
+                attempts = message.setdefault("attempts", {})
+                attempts[webhook_url] = attempts.get(webhook_url, 0) + 1
+                retried.add(path)
+                if attempts[webhook_url] >= OUTBOX_MAX_ATTEMPTS:
+                    given_up.setdefault((webhook_url, status), []).append(message["embed"])
+                    done.setdefault(path, set()).add(webhook_url)
+        for (webhook_url, status), embeds in given_up.items():
+            print(f"Giving up on {webhook_label(webhook_url)} ({status}), dropping {len(embeds)} embed(s)")
+            self.drop(webhook_url, status, embeds)
+        for path, message in messages:
+            if path not in done and path not in retried:
+                continue
+            targets = [url for url in message["targets"] if url not in done.get(path, ())]
+            if targets:
+                message["targets"] = targets
+                message["attempts"] = {url: count for url, count in message.get("attempts", {}).items() if url in targets}
+                write_atomic(path, lambda f: json.dump(message, f))
+            else:
+                os.remove(path)
+        return wait
+
+    def target_stats(self, webhook_url):
+        with self.lock:
+            return self.stats.setdefault(webhook_url, {"sent": 0, "requests": 0, "retries": 0, "dropped": 0, "latency": []})
+
+    def deliver(self, webhook_url, batch):
+        # Returns (webhook_url, spool files finished for this target, spool
+        # files whose attempt failed and counts toward giving up, status).
+        stats = self.target_stats(webhook_url)
+        body = ('{"embeds":[' + ",".join(embed for _, embed in batch) + ']}').encode()
+        stats["requests"] += 1
+        started = time.monotonic()
+        try:
+            response = http_client.post(webhook_url, data=body, headers={"Content-Type": "application/json"}, max_retries=0)
+        except requests.RequestException as e:
+            print(f"Failed to send message to {webhook_label(webhook_url)}: {type(e).__name__}")
+            stats["retries"] += 1
+            metrics.inc("discord_errors_total")
+            self.back_off(webhook_url, None)
+            return webhook_url, [], [path for path, _ in batch], type(e).__name__
+        stats["latency"].append(time.monotonic() - started)
+        headers = response.headers
+        if headers.get("X-RateLimit-Remaining") == "0":
+            try:
+                self.blocked_until[webhook_url] = time.monotonic() + float(headers.get("X-RateLimit-Reset-After", 1))
+            except ValueError:
+                self.blocked_until[webhook_url] = time.monotonic() + 1
+        if 200 <= response.status_code < 300:
+            self.failures.pop(webhook_url, None)
+            stats["sent"] += len(batch)
+            metrics.inc("discord_embeds_total", len(batch), outcome="sent")
+            return webhook_url, [path for path, _ in batch], [], response.status_code
+        if response.status_code == 429:
+            # Rate limiting is expected and doesn't count as a failed attempt.
+            stats["retries"] += 1
+            metrics.inc("discord_throttled_total")
+            self.back_off(webhook_url, response)
+            return webhook_url, [], [], response.status_code
+        if response.status_code >= 500:
+            stats["retries"] += 1
+            metrics.inc("discord_errors_total")
+            self.back_off(webhook_url, response)
+            return webhook_url, [], [path for path, _ in batch], response.status_code
+        # Anything else (bad payload, deleted webhook) will never succeed.
+        print(f"Failed to send message to {webhook_label(webhook_url)}: {response.status_code}, dropping {len(batch)} embed(s)")
+        self.drop(webhook_url, response.status_code, [embed for _, embed in batch])
+        return webhook_url, [path for path, _ in batch], [], response.status_code
+
+    def drop(self, webhook_url, status, embeds):
+        self.target_stats(webhook_url)["dropped"] += len(embeds)
+        metrics.inc("discord_embeds_total", len(embeds), outcome="dropped")
+        failed_path = os.path.join(self.directory, "failed.jsonl")
+        with self.lock, open(failed_path, "a") as f:
+            for embed in embeds:
+                f.write(json.dumps({"webhook": webhook_url, "status": status, "embed": embed}) + "\n")
+
+    def back_off(self, webhook_url, response):
+        attempt = self.failures.get(webhook_url, 0)
+        self.failures[webhook_url] = attempt + 1
+        delay = http_client.retry_after(response) if response is not None else None
+        if delay is None:
+            delay = http_client.backoff(attempt)
+        self.blocked_until[webhook_url] = max(self.blocked_until.get(webhook_url, 0), time.monotonic() + delay)
+
+    def report(self):
+        with self.lock:
+            stats = dict(self.stats)
+        for webhook_url, target in stats.items():
+            latency = sorted(target["latency"])
+            latency_text = f"{latency[len(latency) // 2] * 1000:.0f}ms median, {latency[-1] * 1000:.0f}ms max" if latency else "no responses"
+            print(f"{webhook_label(webhook_url)}: {target['sent']} sent, {target['dropped']} dropped, "
+                  f"{target['requests']} request(s), {target['retries']} retried, {latency_text}")
+
+    def flush(self, timeout=OUTBOX_FLUSH_TIMEOUT):
+        # Wait (bounded) for the spool to drain; anything left is retried by
+        # the next process that starts the outbox.
+        if not self.pending():
+            return True
+        self.start()
+        self.wake.set()
+        deadline = time.monotonic() + timeout
+        with self.idle:
+            while self.pending():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    print(f"{len(self.pending())} Discord message(s) still queued in {self.directory}")
+                    return False
+                self.idle.wait(min(remaining, 1))
+        return True
+
+discord_outbox = DiscordOutbox()
+
+def send_to_discord(webhook_urls, shop_data, layout=DEFAULT_LAYOUT):
+    # Accepts one webhook URL or a list; each embed is built and serialized
+    # once, and the outbox packs them into as few messages as Discord allows.
+    if isinstance(webhook_urls, str):
+        webhook_urls = [webhook_urls]
+    for embed in discord_embeds(shop_data, layout):
+        discord_outbox.enqueue(webhook_urls, embed)
+    print(f"Message queued for {len(webhook_urls)} Discord webhook(s)")
+
+class NameCache:
+    # LRU + TTL cache of cosmetic display names, persisted as JSON lines.
+    # Writes are appended; the file is rewritten in LRU order when it grows
+    # past the live entries or when lookups have changed the recency order.
+    def __init__(self, path=NAME_CACHE_FILE, max_size=NAME_CACHE_MAX_SIZE, ttl=NAME_CACHE_TTL):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.loaded = False
+        self.reordered = False
+        self.lock = threading.RLock()
+
+    def load(self):
+        with self.lock:
+            if not self.loaded:
+                self._load()
+
+    def _load(self):
+        self.loaded = True
+        if not os.path.exists(self.path):
+            return
+        now = time.time()
+        lines = 0
+        with open(self.path) as f:
+            for line in f:
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                    cid, name, ts = entry["id"], entry["name"], entry["ts"]
+                except (ValueError, KeyError):
+                    continue
+                self.entries.pop(cid, None)
+                if now - ts < self.ttl:
+                    self.entries[cid] = (name, ts)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        if lines > len(self.entries):
+            self.compact()
+
+    def get(self, cid):
+        self.load()
+        with self.lock:
+            entry = self.entries.get(cid)
+            if entry is None:
+                metrics.inc("cache_misses_total", cache="names")
+                return None
+            name, ts = entry
+            if time.time() - ts >= self.ttl:
+                del self.entries[cid]
+                self.reordered = True
+                metrics.inc("cache_misses_total", cache="names")
+                return None
+            self.entries.move_to_end(cid)
+            self.reordered = True
+            metrics.inc("cache_hits_total", cache="names")
+            return name
+
+    def set(self, cid, name):
+        self.load()
+        with self.lock:
+            ts = time.time()
+            self.entries.pop(cid, None)
+            self.entries[cid] = (name, ts)
+            if len(self.entries) > self.max_size:
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+                self.compact()
+                return
+            with open(self.path, 'a') as f:
+                f.write(json.dumps({"id": cid, "name": name, "ts": ts}) + "\n")
+
+    def save(self):
+        with self.lock:
+            if self.reordered:
+                self.compact()
+
+    def compact(self):
+        with self.lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                for cid, (name, ts) in self.entries.items():
+                    f.write(json.dumps({"id": cid, "name": name, "ts": ts}) + "\n")
+            os.replace(tmp_path, self.path)
+            self.reordered = False
+
+name_cache = NameCache()
+
+class CosmeticMetadata:
+    # Read side of the offline store built by import_cosmetics: one SQLite
+    # table keyed by cosmetic id, with rows memoized after the first lookup.
+    def __init__(self, path=METADATA_DB):
+        self.path = path
+        self.connection = None
+        self.rows = {}
+        self.lock = threading.Lock()
+
+    def get(self, cid):
+        if cid in self.rows:
+            return self.rows[cid]
+        with self.lock:
+            if self.connection is None:
+                if not os.path.exists(self.path):
+                    return None
+                self.connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            row = self.connection.execute(
+                "SELECT id, name, rarity, series, type, icon, small_icon, featured FROM cosmetics WHERE id = ?", (cid,)
+            ).fetchone()
+        info = CosmeticInfo(*row) if row else None
+        self.rows[cid] = info
+        return info
+
+cosmetic_metadata = CosmeticMetadata()
+
+def import_cosmetics(dump_path, db_path=METADATA_DB):
+    # Accepts the fortnite-api.com bulk dumps: /v2/cosmetics/br ({"data": [...]})
+    # and /v2/cosmetics ({"data": {"br": [...], ...}}).
+    with open(dump_path, encoding="utf-8") as f:
+        data = json.load(f)
+    data = data.get("data", data) if isinstance(data, dict) else data
+    if isinstance(data, dict):
+        data = data.get("br", [])
+
+    def value(field):
+        return field.get("value") if isinstance(field, dict) else field
+
+    rows = []
+    for item in data:
+        images = item.get("images") or {}
+        rows.append((
+            item["id"], item.get("name"), value(item.get("rarity")), value(item.get("series")),
+            (item.get("type") or {}).get("backendValue"), images.get("icon"), images.get("smallIcon"), images.get("featured")
+        ))
+    connection = sqlite3.connect(db_path)
+    try:
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cosmetics (id TEXT PRIMARY KEY COLLATE NOCASE, name TEXT, rarity TEXT, "
+                "series TEXT, type TEXT, icon TEXT, small_icon TEXT, featured TEXT)"
+            )
+            connection.executemany("INSERT OR REPLACE INTO cosmetics VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    finally:
+        connection.close()
+    print(f"Imported {len(rows)} cosmetics into {db_path}")
+
+def fetch_item_name(skin_id):
+    info = cosmetic_metadata.get(skin_id)
+    if info and info.name:
+        return info.name
+    name = name_cache.get(skin_id)
+    if name is not None:
+        return name
+    if OFFLINE:
+        return "Unknown"
+    return download_item_name(skin_id)
+
+def download_item_name(skin_id):
+    url = f"{FORTNITE_API_URL}/v2/cosmetics/br/{skin_id}"
+    try:
+        response = http_client.get(url)
+    except requests.RequestException:
+        return "Unknown"
+    if response.status_code == 200:
+        data = response.json()
+        name = data["data"]["name"]
+        name_cache.set(skin_id, name)
+        return name
     else:
-        print(f"Failed to send message: {response.status_code}")
-
-import requests
-
-import requests
+        return "Unknown"
+
+def fetch_item_names(skin_ids, max_workers=NAME_FETCH_WORKERS):
+    # Resolve every id at once: cache hits are answered inline and the misses
+    # are fetched concurrently, so a cold shop costs about one round trip.
+    names = {}
+    missing = []
+    for skin_id in dict.fromkeys(skin_ids):
+        info = cosmetic_metadata.get(skin_id)
+        name = info.name if info and info.name else name_cache.get(skin_id)
+        if name is not None:
+            names[skin_id] = name
+        elif OFFLINE:
+            names[skin_id] = "Unknown"
+        else:
+            missing.append(skin_id)
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+            names.update(zip(missing, executor.map(download_item_name, missing)))
+    return names
 
-def generate_html(shop, featured_images):
-    html_content = """
+HTML_HEAD = """
     <!DOCTYPE html>
     <html lang="en">
     <head>
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>Izen Shop</title>
-        <meta http-equiv="refresh" content="5"> <!-- Refresh every 5 seconds -->
         <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.3/css/all.min.css">
         <link href="https://fonts.googleapis.com/css2?family=Poppins:wght@600&display=swap" rel="stylesheet">
         <link rel="icon" href="https://cdn.discordapp.com/attachments/1260286129639395461/1260635473437790311/Design_sem_nome_5.png?ex=669009c6&is=668eb846&hm=a694a0829b09b161f0e96f6cb23bb94432bff720c6d592bb40fa4f7fb8e8effd&" type="image/png">
@@ -318,53 +1356,18 @@ def generate_html(shop, featured_images):
             <div class="main-cards">
     """
 
-    def fetch_item_name(skin_id):
-        url = f"https://fortnite-api.com/v2/cosmetics/br/{skin_id}"
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            return data["data"]["name"]
-        else:
-            return "Unknown"
-
-    def generate_featured_item_html(item_data):
-        item_grants = item_data['itemGrants'][0].split(":")[1]
-        img_url = featured_images.get(item_grants, f"https://fortnite-api.com/images/cosmetics/br/{item_grants}/icon.png")
-        item_name = fetch_item_name(item_grants)
-        return f"""
-        <div class="card">
-            <img src="{img_url}" alt="{item_name}">
-            <div class="text-lg">{item_name}</div>
-            <div class="price-tag">{item_data['price']} V-Bucks <img src="images/v-bucks.png" id="v-bucks" alt="V-Bucks"></div>
-        </div>
-        """
-
-    def generate_daily_item_html(item_data):
-        item_grants = item_data['itemGrants'][0].split(":")[1]
-        img_url = f"https://fortnite-api.com/images/cosmetics/br/{item_grants}/icon.png"
-        item_name = fetch_item_name(item_grants)
-        return f"""
-        <div class="sub-card">
-            <img src="{img_url}" alt="{item_name}">
-            <div class="text-lg">{item_name}</div>
-            <div class="price-tag">{item_data['price']} V-Bucks <img src="images/v-bucks.png" id="v-bucks" alt="V-Bucks"></div>
-        </div>
-        """
-
-    # Generate HTML for featured items
-    html_content += generate_featured_item_html(shop["featured1"])
-    html_content += generate_featured_item_html(shop["featured2"])
-
-    # Generate HTML for daily items
-    html_content += """
+HTML_DAILY_OPEN = """
                 <div class="sub-cards-container">
                     <div class="sub-cards">
     """
-    for category, data in shop.items():
-        if category.startswith("daily"):
-            html_content += generate_daily_item_html(data)
 
-    html_content += """
+# Closes one grid of sub-cards and opens the next, between layout sections.
+HTML_SECTION_BREAK = """
+                    </div>
+                </div>
+    """ + HTML_DAILY_OPEN
+
+HTML_TAIL = """
                     </div>
                 </div>
             </div>
@@ -387,598 +1390,454 @@ def generate_html(shop, featured_images):
             updateTime(); // Initial call to set the time immediately
             setInterval(updateTime, 1000); // Update the time every second
         </script>
+        <script>
+            const shopVersion = \""""
+
+HTML_TAIL_END = """";
+            // The server pushes the current shop version on connect and after
+            // every rotation; reload only when it differs from this page's.
+            if (window.EventSource && location.protocol.startsWith('http')) {
+                const events = new EventSource('/events');
+                events.addEventListener('rotation', (event) => {
+                    if (event.data !== shopVersion) {
+                        events.close();
+                        location.reload();
+                    }
+                });
+            }
+        </script>
     </body>
     </html>
     """
 
-    with open("item_shop.html", "w") as file:
-        file.write(html_content)
-    print("HTML file generated: item_shop.html")
+def featured_item_html(item_data, img_url, item_name):
+    return f"""
+        <div class="card">
+            <img src="{img_url}" alt="{item_name}">
+            <div class="text-lg">{item_name}</div>
+            <div class="price-tag">{item_data['price']} V-Bucks <img src="images/v-bucks.png" id="v-bucks" alt="V-Bucks"></div>
+        </div>
+        """
 
-def main(include_battle_pass, include_exclusives, webhook_url, more_accurate=False):
-    print("Starting script...")
-    shop = {}
-    current_season = 6
-
-    # Define paired featured items
-    paired_featured_items = {
-        3: [
-            ("CID_107_Athena_Commando_F_PajamaParty", "CID_093_Athena_Commando_M_Dinosaur"),
-            ("CID_103_Athena_Commando_M_Bunny", "CID_104_Athena_Commando_F_Bunny"),
-            ("CID_097_Athena_Commando_F_RockerPunk", "CID_268_Athena_Commando_M_RockerPunk")
-        ],
-        4: [
-            ("CID_123_Athena_Commando_F_Metal", "CID_122_Athena_Commando_M_Metal"),
-            ("CID_134_Athena_Commando_M_Jailbird", "CID_135_Athena_Commando_F_Jailbird"),
-            ("CID_154_Athena_Commando_M_Gumshoe", "CID_155_Athena_Commando_F_Gumshoe"),
-            ("CID_124_Athena_Commando_F_AuroraGlow", "CID_126_Athena_Commando_M_AuroraGlow")
-        ],
-        5: [
-            ("CID_220_Athena_Commando_F_Clown", "CID_221_Athena_Commando_M_Clown"),
-            ("CID_192_Athena_Commando_M_Hippie", "CID_193_Athena_Commando_F_Hippie"),
-            ("CID_198_Athena_Commando_M_BlueSamurai", "CID_199_Athena_Commando_F_BlueSamurai")
-        ],
-        6: [
-            ("CID_214_Athena_Commando_F_FootballReferee", "CID_215_Athena_Commando_M_FootballReferee"),
-            ("CID_242_Athena_Commando_F_Bullseye", "CID_256_Athena_Commando_M_Pumpkin"),
-            ("CID_255_Athena_Commando_F_HalloweenBunny", "CID_254_Athena_Commando_M_Zombie")
-        ],
-        7: [
-            ("CID_328_Athena_Commando_F_Tennis", "CID_334_Athena_Commando_M_Scrapyard"),
-            ("CID_297_Athena_Commando_F_Math", "CID_296_Athena_Commando_M_Math"),
-            ("CID_345_Athena_Commando_M_LoveLlama", "EID_KissKiss")
-        ],
-        8: [
-            ("CID_397_Athena_Commando_F_TreasureHunterFashion", "CID_398_Athena_Commando_M_TreasureHunterFashion"),
-            ("CID_394_Athena_Commando_M_MoonlightAssassin", "CID_395_Athena_Commando_F_ShatterFly"),
-            ("CID_372_Athena_Commando_F_Pirate01", "CID_373_Athena_Commando_M_Pirate01"),
-            ("CID_358_Athena_Commando_M_Aztec", "CID_359_Athena_Commando_F_Aztec"),
-            ("CID_355_Athena_Commando_M_Farmer", "CID_356_Athena_Commando_F_Farmer"),
-            ("CID_392_Athena_Commando_F_BountyBunny", "CID_391_Athena_Commando_M_HoppityHeist")
-        ]
-    }
+def daily_item_html(item_data, img_url, item_name):
+    return f"""
+        <div class="sub-card">
+            <img src="{img_url}" alt="{item_name}">
+            <div class="text-lg">{item_name}</div>
+            <div class="price-tag">{item_data['price']} V-Bucks <img src="images/v-bucks.png" id="v-bucks" alt="V-Bucks"></div>
+        </div>
+        """
 
-    skins_by_season = {
-        1: {
-            "rare": [
-                "CID_041_Athena_Commando_F_District", "CID_040_Athena_Commando_M_District", 
-                "CID_045_Athena_Commando_M_HolidaySweater", "CID_046_Athena_Commando_F_HolidaySweater", 
-                "CID_016_Athena_Commando_F", "CID_013_Athena_Commando_F", "CID_014_Athena_Commando_F", 
-                "CID_009_Athena_Commando_M", "CID_012_Athena_Commando_M", "CID_015_Athena_Commando_F", 
-                "CID_011_Athena_Commando_M"
-            ],
-            "super_rare": [
-                "CID_037_Athena_Commando_F_WinterCamo", "CID_042_Athena_Commando_M_Cyberpunk", 
-                "CID_047_Athena_Commando_F_HolidayReindeer", "CID_051_Athena_Commando_M_HolidayElf", 
-                "CID_044_Athena_Commando_F_SciPop", "CID_024_Athena_Commando_F", "CID_019_Athena_Commando_M", 
-                "CID_023_Athena_Commando_F", "CID_026_Athena_Commando_M", "CID_027_Athena_Commando_F", 
-                "CID_018_Athena_Commando_M", "CID_021_Athena_Commando_F", "CID_020_Athena_Commando_M", 
-                "CID_022_Athena_Commando_F", "CID_025_Athena_Commando_M", "CID_028_Athena_Commando_F", 
-                "CID_017_Athena_Commando_M"
-            ],
-            "epic": [
-                "CID_038_Athena_Commando_M_Disco", "CID_048_Athena_Commando_F_HolidayGingerbread", 
-                "CID_049_Athena_Commando_M_HolidayGingerbread", "CID_029_Athena_Commando_F_Halloween", 
-                "CID_030_Athena_Commando_M_Halloween"
-            ],
-            "legendary": [
-                "CID_031_Athena_Commando_M_Retro", "CID_050_Athena_Commando_M_HolidayNutcracker",
-                "CID_034_Athena_Commando_F_Medieval"
-            ]
-        },
-        2: {
-            "rare": [
-                "CID_079_Athena_Commando_F_Camo", "CID_074_Athena_Commando_F_Stripe", 
-                "CID_075_Athena_Commando_F_Stripe", "CID_078_Athena_Commando_M_Camo",
-                "CID_106_Athena_Commando_F_Taxi", "CID_098_Athena_Commando_F_StPatty", 
-                "CID_086_Athena_Commando_M_RedSilk", "CID_087_Athena_Commando_F_RedSilk"
-            ],
-            "super_rare": [
-                "CID_074_Athena_Commando_F_Stripe", "CID_072_Athena_Commando_M_Scout", 
-                "CID_076_Athena_Commando_F_Sup", "CID_073_Athena_Commando_F_Scuba", 
-                "CID_077_Athena_Commando_M_Sup", "CID_110_Athena_Commando_F_CircuitBreaker", 
-                "CID_101_Athena_Commando_M_Stealth", "CID_092_Athena_Commando_F_RedShirt", 
-                "CID_091_Athena_Commando_M_RedShirt"
-            ],
-            "epic": [
-                "CID_061_Athena_Commando_F_SkiGirl", "CID_067_Athena_Commando_F_SkiGirl_CHN",
-                "CID_066_Athena_Commando_F_SkiGirl_GER", "CID_065_Athena_Commando_F_SkiGirl_FRA",
-                "CID_064_Athena_Commando_F_SkiGirl_GBR", "CID_063_Athena_Commando_F_SkiGirl_CAN",
-                "CID_062_Athena_Commando_F_SkiGirl_USA", "CID_061_Athena_Commando_F_SkiGirl",
-                "CID_060_Athena_Commando_M_SkiDude_KOR", "CID_059_Athena_Commando_M_SkiDude_CHN",
-                "CID_058_Athena_Commando_M_SkiDude_GER", "CID_057_Athena_Commando_M_SkiDude_FRA",
-                "CID_056_Athena_Commando_M_SkiDude_GBR", "CID_055_Athena_Commando_M_SkiDude_CAN",
-                "CID_054_Athena_Commando_M_SkiDude_USA", "CID_053_Athena_Commando_M_SkiDude",
-                "CID_112_Athena_Commando_M_Brite", "CID_111_Athena_Commando_F_Robo",
-                "CID_109_Athena_Commando_M_Pizza", "CID_103_Athena_Commando_M_Bunny",
-                "CID_104_Athena_Commando_F_Bunny", "CID_099_Athena_Commando_F_Scathach",
-                "CID_094_Athena_Commando_M_Rider"
-            ],
-            "legendary": [
-                "CID_071_Athena_Commando_M_Wukong", "CID_070_Athena_Commando_M_Cupid",
-                "CID_069_Athena_Commando_F_PinkBear", "CID_107_Athena_Commando_F_PajamaParty",
-                "CID_093_Athena_Commando_M_Dinosaur", "CID_105_Athena_Commando_F_SpaceBlack",
-                "CID_102_Athena_Commando_M_Raven", "CID_097_Athena_Commando_F_RockerPunk",
-                "CID_100_Athena_Commando_M_CuChulainn"
-            ]
-        },
-        3: {
-            "rare": [
-                
-            ],
-            "super_rare": [
-                "CID_268_Athena_Commando_M_RockerPunk",   
-            ],
-            "epic": [
-                "CID_103_Athena_Commando_M_Bunny", "CID_104_Athena_Commando_F_Bunny",
-            ],
-            "legendary": [
-                "CID_097_Athena_Commando_F_RockerPunk", "CID_268_Athena_Commando_M_RockerPunk",
-            ]
-        },
-        4: {
-            "rare": [
-                "CID_124_Athena_Commando_F_AuroraGlow", "CID_126_Athena_Commando_M_AuroraGlow",
-            ],
-            "super_rare": [
-                "CID_260_Athena_Commando_F_StreetOps", "CID_259_Athena_Commando_M_StreetOps",
-                "CID_275_Athena_Commando_M_SniperHood", "CID_276_Athena_Commando_F_SniperHood",
-                "CID_268_Athena_Commando_M_RockerPunk", "CID_271_Athena_Commando_F_SushiChef",
-                "CID_191_Athena_Commando_M_SushiChef", "CID_262_Athena_Commando_M_MadCommander",
-                "CID_263_Athena_Commando_F_MadCommander", "CID_246_Athena_Commando_F_Grave",
-                "CID_223_Athena_Commando_M_Dieselpunk", "CID_223_Athena_Commando_M_Dieselpunk","CID_122_Athena_Commando_M_Metal","CID_123_Athena_Commando_F_Metal"
-            ],
-            "epic": [
-                "CID_220_Athena_Commando_F_Clown", "CID_221_Athena_Commando_M_Clown ",
-                "CID_192_Athena_Commando_M_Hippie ", "CID_193_Athena_Commando_F_Hippie",
-            ],
-            "legendary": [
-                "CID_198_Athena_Commando_M_BlueSamurai", "CID_199_Athena_Commando_F_BlueSamurai",
-            ]
-        },
-        6: {
-            "rare": [
-                "CID_214_Athena_Commando_F_FootballReferee", "CID_215_Athena_Commando_M_FootballReferee",
-                "CID_242_Athena_Commando_F_Bullseye", "CID_256_Athena_Commando_M_Pumpkin",
-                "CID_255_Athena_Commando_F_HalloweenBunny", "CID_254_Athena_Commando_M_Zombie"
-            ],
-            "super_rare": [
-                "CID_260_Athena_Commando_F_StreetOps", "CID_259_Athena_Commando_M_StreetOps",
-                "CID_275_Athena_Commando_M_SniperHood", "CID_276_Athena_Commando_F_SniperHood",
-                "CID_268_Athena_Commando_M_RockerPunk", "CID_271_Athena_Commando_F_SushiChef",
-                "CID_191_Athena_Commando_M_SushiChef", "CID_262_Athena_Commando_M_MadCommander",
-                "CID_263_Athena_Commando_F_MadCommander", "CID_246_Athena_Commando_F_Grave",
-                "CID_223_Athena_Commando_M_Dieselpunk", "CID_223_Athena_Commando_M_Dieselpunk"
-            ],
-            "epic": [
-                "CID_247_Athena_Commando_M_GuanYu", "CID_277_Athena_Commando_M_Moth",
-                "CID_272_Athena_Commando_M_HornedMask", "CID_274_Athena_Commando_M_Feathers",
-                "CID_269_Athena_Commando_M_Wizard", "CID_270_Athena_Commando_F_Witch",
-                "CID_266_Athena_Commando_F_LlamaRider", "CID_264_Athena_Commando_M_AnimalJackets",
-                "CID_265_Athena_Commando_F_AnimalJackets", "CID_251_Athena_Commando_F_Muertos",
-                "CID_252_Athena_Commando_M_Muertos", "CID_258_Athena_Commando_F_FuzzyBearHalloween",
-                "CID_244_Athena_Commando_M_PumpkinSuit", "CID_228_Athena_Commando_M_Vampire",
-                "CID_243_Athena_Commando_M_PumpkinSlice", "CID_240_Athena_Commando_F_Plague",
-                "CID_241_Athena_Commando_M_Plague", "CID_235_Athena_Commando_M_Scarecrow",
-                "CID_225_Athena_Commando_M_Octoberfest", "CID_226_Athena_Commando_F_Octoberfest","CID_220_Athena_Commando_F_Clown","CID_192_Athena_Commando_M_Hippie","CID_221_Athena_Commando_M_Clown","CID_154_Athena_Commando_M_Gumshoe","CID_155_Athena_Commando_F_Gumshoe"
-            ],
-            "legendary": [
-                "CID_257_Athena_Commando_M_SamuraiUltra", "CID_250_Athena_Commando_M_EvilCowboy",
-                "CID_248_Athena_Commando_M_BlackWidow", "CID_249_Athena_Commando_F_BlackWidow"
-            ]
-        },
-        7: {
-            "rare": [
-                
-            ],
-            "super_rare": [
-                "CID_328_Athena_Commando_F_Tennis", "CID_334_Athena_Commando_M_Scrapyard",
-                "CID_297_Athena_Commando_F_Math", "CID_296_Athena_Commando_M_Math",
-                "CID_345_Athena_Commando_M_LoveLlama","CID_328_Athena_Commando_F_Tennis","CID_334_Athena_Commando_M_Scrapyard"
-            ],
-            "epic": [
-                
-            ],
-            "legendary": [
-                
-            ]
-        },
-        8: {
-            "rare": [
-                "CID_397_Athena_Commando_F_TreasureHunterFashion", "CID_398_Athena_Commando_M_TreasureHunterFashion",
-                "CID_401_Athena_Commando_M_Miner", "CID_392_Athena_Commando_F_BountyBunny", 
-                "CID_387_Athena_Commando_F_Golf", "CID_383_Athena_Commando_F_Cacti", 
-                "CID_354_Athena_Commando_M_MunitionsExpert", "CID_355_Athena_Commando_M_Farmer",
-                "CID_356_Athena_Commando_F_Farmer"
-            ],
-            "super_rare": [
-                "CID_395_Athena_Commando_F_ShatterFly", "CID_391_Athena_Commando_M_HoppityHeist",
-                "CID_372_Athena_Commando_F_Pirate01", "CID_373_Athena_Commando_M_Pirate01",
-                "CID_381_Athena_Commando_F_BaseballKitbash", "CID_382_Athena_Commando_M_BaseballKitbash",
-                "CID_363_Athena_Commando_M_SciOps", "CID_364_Athena_Commando_F_SciOps",
-                "CID_366_Athena_Commando_M_Tropical", "CID_353_Athena_Commando_F_Bandolier",
-                "CID_358_Athena_Commando_M_Aztec", "CID_359_Athena_Commando_F_Aztec",
-                "CID_357_Athena_Commando_M_OrangeCamo"
-            ],
-            "epic": [
-                "CID_394_Athena_Commando_M_MoonlightAssassin", "CID_396_Athena_Commando_F_Swashbuckler",
-                "CID_393_Athena_Commando_M_Shiny", "CID_388_Athena_Commando_M_TheBomb",
-                "CID_390_Athena_Commando_M_EvilBunny", "CID_376_Athena_Commando_M_DarkShaman",
-                "CID_377_Athena_Commando_F_DarkShaman", "CID_301_Athena_Commando_M_Rhino",
-                "CID_365_Athena_Commando_M_LuckyRider", "CID_361_Athena_Commando_M_BandageNinja",
-                "CID_362_Athena_Commando_F_BandageNinja","CID_358_Athena_Commando_M_Aztec","CID_359_Athena_Commando_F_Aztec"
-            ],
-            "legendary": [
-                "CID_385_Athena_Commando_M_PilotSkull", "CID_369_Athena_Commando_F_DevilRock"
-            ]
-        }
-    }
-    
-    skins_battlepass_by_season = {
-        2: {
-            "legendary": ["CID_084_Athena_Commando_M_Assassin", "CID_088_Athena_Commando_M_SpaceBlack"],
-            "epic": [
-                "CID_080_Athena_Commando_M_Space", "CID_081_Athena_Commando_F_Space",
-                "CID_082_Athena_Commando_M_Scavenger", "CID_083_Athena_Commando_F_Tactical"
-            ],
-            "super_rare": ["Pickaxe_ID_027_Scavenger"],
-            "rare": ["EID_Salute"],
-            "super_rare": ["EID_TakeTheL", "EID_BestMates"],
-            "epic": ["EID_Robot"]
-        },
-        6: {
-            "legendary": [
-                "CID_230_Athena_Commando_M_Werewolf", "CID_237_Athena_Commando_F_Cowgirl",
-                "CID_267_Athena_Commando_M_RobotRed"
-            ],
-            "epic": [
-                "CID_227_Athena_Commando_F_Vampire", "CID_231_Athena_Commando_F_RedRiding",
-                "CID_232_Athena_Commando_F_HalloweenTomato", "CID_233_Athena_Commando_M_FortniteDJ",
-                "CID_234_Athena_Commando_M_LlamaRider"
-            ],
-            "super_rare": [
-                "EID_Octopus", "EID_RunningMan", "EID_NeedToGo"
-            ],
-            "rare": [
-                "EID_RegalWave"
-            ]
-        },
-        8: {
-            "legendary": ["CID_378_Athena_Commando_M_FurnaceFace", "CID_346_Athena_Commando_M_DragonNinja",
-                          "CID_347_Athena_Commando_M_PirateProgressive", "CID_352_Athena_Commando_F_Shiny"],
-            "epic": [
-                "CID_348_Athena_Commando_F_Medusa", "CID_349_Athena_Commando_M_Banana",
-                "CID_350_Athena_Commando_M_MasterKey", "CID_351_Athena_Commando_F_FireElf"
-            ],
-            "super_rare": ["Pickaxe_ID_167_Medusa", "Pickaxe_ID_165_MasterKey"],
-            "rare": ["EID_HappyWave"],
-            "super_rare": ["EID_YouBoreMe", "EID_Banana", "EID_Conga"],
-            "epic": ["EID_HulaHoop"]
-        }
-    }
+def item_image_url(cid):
+    info = cosmetic_metadata.get(cid)
+    if info and info.icon:
+        return info.icon
+    return f"https://fortnite-api.com/images/cosmetics/br/{cid}/icon.png"
+
+def shop_card(slot, kind, item_data, img_url, section=None):
+    cid = item_data['itemGrants'][0].split(":")[1]
+    key = f"{CARD_TEMPLATE_VERSION}|{kind}|{item_data['itemGrants'][0]}|{item_data['price']}|{img_url}"
+    return ShopCard(slot, kind, item_data, cid, img_url, key, section)
+
+def shop_cards(shop, featured_images, layout=DEFAULT_LAYOUT):
+    # Cards in layout order; slots the shop couldn't fill are left out.
+    cards = []
+    for section in layout:
+        for i in range(1, len(section.slots) + 1):
+            slot = f"{section.name}{i}"
+            if slot not in shop:
+                continue
+            cid = shop[slot]['itemGrants'][0].split(":")[1]
+            img_url = featured_images.get(cid) if section.style == "card" else None
+            cards.append(shop_card(slot, section.style, shop[slot], img_url or item_image_url(cid), section.name))
+    return cards
+
+def render_card(card, item_name):
+    if card.kind == "card":
+        return featured_item_html(card.item_data, card.img_url, item_name)
+    return daily_item_html(card.item_data, card.img_url, item_name)
+
+class FragmentCache:
+    # Rendered card HTML of the last page, keyed by everything that goes into
+    # the card. Only cards whose key is missing need a name lookup and render.
+    def __init__(self, path=FRAGMENTS_FILE):
+        self.path = path
+        self.fragments = None
+
+    def load(self):
+        if self.fragments is not None:
+            return
+        try:
+            with open(self.path) as f:
+                self.fragments = json.load(f)
+        except (OSError, ValueError):
+            self.fragments = {}
+
+    def get(self, key):
+        self.load()
+        return self.fragments.get(key)
+
+    def replace(self, fragments):
+        self.load()
+        if fragments == self.fragments:
+            return
+        self.fragments = fragments
+        write_atomic(self.path, lambda f: json.dump(fragments, f))
+
+fragment_cache = FragmentCache()
+
+def shop_version(shop):
+    return hashlib.sha256(json.dumps(shop, sort_keys=True).encode()).hexdigest()[:16]
+
+def page_version(body):
+    # The shop version a rendered page was built for, or None for pages
+    # without one.
+    marker = b'const shopVersion = "'
+    start = body.find(marker)
+    if start < 0:
+        return None
+    start += len(marker)
+    return body[start:body.find(b'"', start)].decode() or None
+
+def render_html(cards, fragments, out, version=""):
+    # Streams the page to any writable text stream; the static parts are
+    # module constants so nothing is rebuilt or copied per card.
+    out.write(HTML_HEAD)
+    for card in cards:
+        if card.kind == "card":
+            out.write(fragments[card.key])
+    out.write(HTML_DAILY_OPEN)
+    section = None
+    for card in cards:
+        if card.kind == "sub-card":
+            if section is not None and card.section != section:
+                out.write(HTML_SECTION_BREAK)
+            section = card.section
+            out.write(fragments[card.key])
+    out.write(HTML_TAIL)
+    out.write(version)
+    out.write(HTML_TAIL_END)
+
+def write_atomic(path, write, mode='w', durable=False):
+    # Readers see either the old file or the complete new one, never a
+    # partial write: render into a temp file alongside, then rename over.
+    # durable also fsyncs the data and the rename so a crash can't undo them.
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            write(f)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        if durable and hasattr(os, "O_DIRECTORY"):
+            fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class ImageCache:
+    # Content-addressed local copies of card art. index.json maps each source
+    # URL to the file named after the SHA-256 of its bytes, plus an optional
+    # WebP thumbnail (only when Pillow is installed).
+    def __init__(self, directory=IMAGE_CACHE_DIR, thumbnail_size=THUMBNAIL_SIZE):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.json')
+        self.thumbnail_size = thumbnail_size
+        self.index = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        if self.index is not None:
+            return
+        try:
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def cached_file(self, url):
+        # Entries for non-image files (stored before downloads were checked)
+        # count as missing so they are fetched again.
+        entry = self.index.get(url)
+        if not entry:
+            return None
+        guessed = mimetypes.guess_type(entry["file"])[0]
+        if guessed and not guessed.startswith("image/"):
+            return None
+        if os.path.exists(os.path.join(self.directory, entry["file"])):
+            return entry
+        return None
 
-    exclusive_items = {
-        "rare": [],
-        "super_rare": ["Pickaxe_ID_039_TacticalBlack"],
-        "epic": [
-            "CID_090_Athena_Commando_M_Tactical", "CID_085_Athena_Commando_M_Twitch"
-        ],
-        "legendary": [
-            "CID_095_Athena_Commando_M_Founder", "CID_089_Athena_Commando_M_RetroGrey",
-            "CID_096_Athena_Commando_F_Founder"
-        ]
-    }
+    def download(self, url):
+        if OFFLINE:
+            return None
+        try:
+            response = http_client.get(url)
+        except requests.RequestException:
+            return None
+        if response.status_code != 200 or not response.content:
+            return None
+        # CDN error and challenge pages come back as 200 text/html; only
+        # cache actual images, the card keeps its remote URL otherwise.
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if not content_type.startswith("image/"):
+            return None
+        digest = hashlib.sha256(response.content).hexdigest()
+        ext = mimetypes.guess_extension(content_type) or os.path.splitext(urlsplit(url).path)[1] or ".img"
+        name = digest + ext
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            write_atomic(path, lambda f: f.write(response.content), 'wb')
+        return {"file": name}
+
+    def thumbnail(self, entry):
+        if Image is None:
+            return None
+        name = f"{os.path.splitext(entry['file'])[0]}_{self.thumbnail_size}.webp"
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            try:
+                with Image.open(os.path.join(self.directory, entry["file"])) as image:
+                    image.thumbnail((self.thumbnail_size, self.thumbnail_size))
+                    write_atomic(path, lambda f: image.save(f, "WEBP"), 'wb')
+            except OSError:
+                return None
+        return name
+
+    def localize(self, urls, thumbnails=()):
+        # Returns {url: absolute local path}; URLs that could not be fetched
+        # are left out so the caller keeps pointing at the original host.
+        self.load()
+        os.makedirs(self.directory, exist_ok=True)
+        unique = list(dict.fromkeys(urls))
+        missing = [url for url in unique if not self.cached_file(url)]
+        metrics.inc("cache_hits_total", len(unique) - len(missing), cache="images")
+        metrics.inc("cache_misses_total", len(missing), cache="images")
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(NAME_FETCH_WORKERS, len(missing))) as executor:
+                for url, entry in zip(missing, executor.map(self.download, missing)):
+                    if entry:
+                        self.index[url] = entry
+        paths = {}
+        for url in urls:
+            entry = self.cached_file(url)
+            if not entry:
+                continue
+            name = entry["file"]
+            if url in thumbnails:
+                if not entry.get("thumb"):
+                    entry["thumb"] = self.thumbnail(entry)
+                name = entry["thumb"] or name
+            paths[url] = os.path.join(self.directory, name)
+        with self.lock:
+            write_atomic(self.index_path, lambda f: json.dump(self.index, f, indent=1))
+        return paths
+
+image_cache = ImageCache()
+
+def localize_cards(cards, output_path):
+    thumbnails = {card.img_url for card in cards if card.kind == "sub-card"}
+    paths = image_cache.localize([card.img_url for card in cards], thumbnails)
+    page_dir = os.path.dirname(os.path.abspath(output_path))
+    localized = []
+    for card in cards:
+        img_url = card.img_url
+        if img_url in paths:
+            img_url = os.path.relpath(paths[img_url], page_dir).replace(os.sep, "/")
+        localized.append(shop_card(card.slot, card.kind, card.item_data, img_url, card.section))
+    return localized
+
+def generate_html(shop, featured_images, output_path=None, cache=None, localize_images=None,
+                  layout=DEFAULT_LAYOUT):
+    output_path = output_path or HTML_FILE
+    cache = fragment_cache if cache is None else cache
+    localize_images = LOCALIZE_IMAGES if localize_images is None else localize_images
+    cards = shop_cards(shop, featured_images, layout)
+    if localize_images:
+        cards = localize_cards(cards, output_path)
+    fragments = {}
+    stale = []
+    for card in cards:
+        fragment = cache.get(card.key)
+        if fragment is None:
+            stale.append(card)
+        else:
+            fragments[card.key] = fragment
+    metrics.inc("cache_hits_total", len(cards) - len(stale), cache="fragments")
+    metrics.inc("cache_misses_total", len(stale), cache="fragments")
+    unresolved = set()
+    if stale:
+        item_names = fetch_item_names([card.cid for card in stale])
+        name_cache.save()
+        for card in stale:
+            fragments[card.key] = render_card(card, item_names[card.cid])
+            if item_names[card.cid] == "Unknown":
+                unresolved.add(card.key)
+        print(f"Rendered {len(stale)} changed card(s): {', '.join(card.slot for card in stale)}")
+    # The key has no name in it, so a card whose lookup failed must not be
+    # kept or it would show "Unknown" until its price or image changes.
+    cache.replace({key: fragment for key, fragment in fragments.items() if key not in unresolved})
+
+    write_atomic(output_path, lambda f: render_html(cards, fragments, f, shop_version(shop)))
+    print(f"HTML file generated: {output_path}")
+
+def pick_featured_pair(paired_featured_items, used_items, pool, rng, cooldown=frozenset()):
+    # Choose a season that still has an unused pair, preferring seasons with
+    # a pair that isn't cooling down, then a pair from it.
+    def open_pair(pair, taken):
+        return pair[0] not in taken and pair[1] not in taken
+
+    seasons = [season for season, pairs in paired_featured_items.items() if any(open_pair(pair, used_items) for pair in pairs)]
+    if not seasons:
+        return None, None
+    if cooldown:
+        seasons = [
+            season for season in seasons
+            if any(open_pair(pair, used_items) and open_pair(pair, cooldown) for pair in paired_featured_items[season])
+        ] or seasons
+    selected_season = rng.choice(seasons)
+    return get_paired_featured_items(paired_featured_items[selected_season], used_items, pool.combined_items, rng, cooldown)
+
+def select_slot_item(pool, categories, rarity_weights, used_items, rng, cooldown=frozenset()):
+    if len(categories) == 1:
+        return ensure_non_none_items(1, categories[0], used_items, pool.index, rarity_weights, rng, cooldown)[0]
+    categories = list(categories)
+    rng.shuffle(categories)
+    # Every category gets a chance to fill the slot with a fresh item before
+    # any of them falls back to items on cooldown.
+    for release in (False, True):
+        for category in categories:
+            try:
+                return ensure_non_none_items(1, category, used_items, pool.index, rarity_weights, rng, cooldown, release)[0]
+            except ValueError:
+                continue
+    raise ValueError(f"Not enough {'/'.join(sorted(categories))} items to fill a slot")
+
+def select_section_items(pool, section, paired_featured_items, more_accurate, used_items, rng=None, cooldown=frozenset()):
+    rng = rng or random
+    slots = [f"{section.name}{i}" for i in range(1, len(section.slots) + 1)]
+    items = {}
+    if section.paired and more_accurate:
+        while len(slots) - len(items) >= 2:
+            first, second = pick_featured_pair(paired_featured_items, used_items, pool, rng, cooldown)
+            if first is None:
+                break
+            filled = len(items)
+            items[slots[filled]], items[slots[filled + 1]] = first, second
+    for slot, categories in list(zip(slots, section.slots))[len(items):]:
+        items[slot] = select_slot_item(pool, categories, section.rarity_weights, used_items, rng, cooldown)
+    return items
 
-    backbling_mapping = {
-        "CID_038_Athena_Commando_M_Disco": "BID_323_FunkOpsRemix",
-        "CID_048_Athena_Commando_F_HolidayGingerbread": "BID_187_GingerbreadFemale",
-        "CID_049_Athena_Commando_M_HolidayGingerbread": "BID_186_GingerbreadMale",
-        "CID_050_Athena_Commando_M_HolidayNutcracker": "BID_182_NutcrackerMale",
-        "CID_034_Athena_Commando_F_Medieval": "BID_003_RedKnight",
-        "CID_035_Athena_Commando_M_Medieval": "BID_004_BlackKnight",
-        "CID_032_Athena_Commando_M_Medieval": "BID_001_BlueSquire",
-        "CID_033_Athena_Commando_F_Medieval": "BID_002_RoyaleKnight",
-        "CID_061_Athena_Commando_F_SkiGirl": "BID_014_SkiGirl",
-        "CID_067_Athena_Commando_F_SkiGirl_CHN": "BID_020_SkiGirl_CHN",
-        "CID_066_Athena_Commando_F_SkiGirl_GER": "BID_019_SkiGirl_GER",
-        "CID_065_Athena_Commando_F_SkiGirl_FRA": "BID_021_SkiGirl_FRA",
-        "CID_064_Athena_Commando_F_SkiGirl_GBR": "BID_017_SkiGirl_GBR",
-        "CID_063_Athena_Commando_F_SkiGirl_CAN": "BID_016_SkiGirl_CAN",
-        "CID_062_Athena_Commando_F_SkiGirl_USA": "BID_015_SkiGirl_USA",
-        "CID_060_Athena_Commando_M_SkiDude_KOR": "BID_013_SkiDude_KOR",
-        "CID_059_Athena_Commando_M_SkiDude_CHN": "BID_012_SkiDude_CHN",
-        "CID_058_Athena_Commando_M_SkiDude_GER": "BID_011_SkiDude_GER",
-        "CID_057_Athena_Commando_M_SkiDude_FRA": "BID_010_SkiDude_FRA",
-        "CID_056_Athena_Commando_M_SkiDude_GBR": "BID_009_SkiDude_GBR",
-        "CID_055_Athena_Commando_M_SkiDude_CAN": "BID_008_SkiDude_CAN",
-        "CID_054_Athena_Commando_M_SkiDude_USA": "BID_007_SkiDude_USA",
-        "CID_053_Athena_Commando_M_SkiDude": "BID_014_SkiGirl",
-        "CID_071_Athena_Commando_M_Wukong": "BID_182_NutcrackerMale",
-        "CID_070_Athena_Commando_M_Cupid": "BID_022_Cupid",
-        "CID_112_Athena_Commando_M_Brite": "BID_026_Brite",
-        "CID_109_Athena_Commando_M_Pizza": "BID_043_Pizza",
-        "CID_103_Athena_Commando_M_Bunny": "BID_037_BunnyMale",
-        "CID_104_Athena_Commando_F_Bunny": "BID_038_BunnyFemale",
-        "CID_099_Athena_Commando_F_Scathach": "BID_035_Scathach",
-        "CID_094_Athena_Commando_M_Rider": "BID_381_RustyRaiderMotor",
-        "CID_107_Athena_Commando_F_PajamaParty": "BID_041_PajamaParty",
-        "CID_093_Athena_Commando_M_Dinosaur": "BID_031_Dinosaur",
-        "CID_105_Athena_Commando_F_SpaceBlack": "BID_039_SpaceBlackFemale",
-        "CID_102_Athena_Commando_M_Raven": "BID_036_Raven",
-        "CID_097_Athena_Commando_F_RockerPunk": "BID_034_RockerPunk",
-        "CID_100_Athena_Commando_M_CuChulainn": "BID_063_CuChulainn",
-        "CID_082_Athena_Commando_M_Scavenger": "BID_027_Scavenger",
-        "CID_083_Athena_Commando_F_Tactical": "BID_025_Tactical",
-        "CID_088_Athena_Commando_M_SpaceBlack": "BID_028_SpaceBlack",
-        "CID_090_Athena_Commando_M_Tactical": "BID_030_TacticalRogue",
-        "CID_095_Athena_Commando_M_Founder": "BID_032_FounderMale",
-        "CID_096_Athena_Commando_F_Founder": "BID_033_FounderFemale",
-        "CID_260_Athena_Commando_F_StreetOps": "BID_141_StreetOpsFemale",
-        "CID_259_Athena_Commando_M_StreetOps": "BID_140_StreetOpsMale",
-        "CID_275_Athena_Commando_M_SniperHood": "BID_155_SniperHoodMale",
-        "CID_271_Athena_Commando_F_SushiChef": "BID_151_SushiChefFemale",
-        "CID_191_Athena_Commando_M_SushiChef": "BID_088_SushiChefMale",
-        "CID_262_Athena_Commando_M_MadCommander": "BID_143_MadCommanderMale",
-        "CID_263_Athena_Commando_F_MadCommander": "BID_144_MadCommanderFemale",
-        "CID_223_Athena_Commando_M_Dieselpunk": "BID_116_DieselpunkFemale",
-        "CID_223_Athena_Commando_M_Dieselpunk": "BID_115_DieselpunkMale",
-        "CID_247_Athena_Commando_M_GuanYu": "BID_133_GuanYu",
-        "CID_277_Athena_Commando_M_Moth": "BID_157_MothMale",
-        "CID_272_Athena_Commando_M_HornedMask": "BID_153_HornedMaskFemale",
-        "CID_274_Athena_Commando_M_Feathers": "BID_154_Feathers",
-        "CID_269_Athena_Commando_M_Wizard": "BID_149_Wizard",
-        "CID_270_Athena_Commando_F_Witch": "BID_150_Witch",
-        "CID_264_Athena_Commando_M_AnimalJackets": "BID_145_AnimalJacketsMale",
-        "CID_265_Athena_Commando_F_AnimalJackets": "BID_146_AnimalJacketsFemale",
-        "CID_251_Athena_Commando_F_Muertos": "BID_135_MuertosFemale",
-        "CID_252_Athena_Commando_M_Muertos": "BID_136_MuertosMale",
-        "CID_228_Athena_Commando_M_Vampire": "BID_130_VampireMale02",
-        "CID_243_Athena_Commando_M_PumpkinSlice": "BID_129_PumpkinSlice",
-        "CID_240_Athena_Commando_F_Plague": "BID_128_PlagueFemale",
-        "CID_241_Athena_Commando_M_Plague": "BID_127_PlagueMale",
-        "CID_235_Athena_Commando_M_Scarecrow": "BID_124_ScarecrowMale",
-        "CID_225_Athena_Commando_M_Octoberfest": "BID_117_OctoberfestMale",
-        "CID_226_Athena_Commando_F_Octoberfest": "BID_118_OctoberfestFemale",
-        "CID_257_Athena_Commando_M_SamuraiUltra": "BID_142_SamuraiUltra",
-        "CID_250_Athena_Commando_M_EvilCowboy": "BID_137_EvilCowboy",
-        "CID_248_Athena_Commando_M_BlackWidow": "BID_132_BlackWidowMale",
-        "CID_249_Athena_Commando_F_BlackWidow": "BID_131_BlackWidowfemale",
-        "CID_230_Athena_Commando_M_Werewolf": "BID_120_Werewolf",
-        "CID_267_Athena_Commando_M_RobotRed": "BID_148_RobotRed",
-        "CID_395_Athena_Commando_F_ShatterFly": "BID_256_ShatterFly",
-        "CID_391_Athena_Commando_M_HoppityHeist": "BID_253_HoppityHeist",
-        "CID_372_Athena_Commando_F_Pirate01": "BID_236_Pirate01Female",
-        "CID_373_Athena_Commando_M_Pirate01": "BID_238_Pirate02Male",
-        "CID_381_Athena_Commando_F_BaseballKitbash": "BID_245_BaseballKitbashFemale",
-        "CID_382_Athena_Commando_M_BaseballKitbash": "BID_246_BaseballKitbashMale",
-        "CID_363_Athena_Commando_M_SciOps": "BID_228_SciOpsMale",
-        "CID_364_Athena_Commando_F_SciOps": "BID_227_SciOpsFemale",
-        "CID_366_Athena_Commando_M_Tropical": "BID_230_TropicalMale",
-        "CID_358_Athena_Commando_M_Aztec": "BID_221_AztecMale",
-        "CID_359_Athena_Commando_F_Aztec": "BID_222_AztecFemale",
-        "CID_357_Athena_Commando_M_OrangeCamo": "BID_223_OrangeCamo",
-        "CID_394_Athena_Commando_M_MoonlightAssassin": "BID_255_MoonlightAssassin",
-        "CID_396_Athena_Commando_F_Swashbuckler": "BID_257_Swashbuckler",
-        "CID_393_Athena_Commando_M_Shiny": "BID_254_ShinyMale",
-        "CID_388_Athena_Commando_M_TheBomb": "BID_250_TheBomb",
-        "CID_390_Athena_Commando_M_EvilBunny": "BID_252_EvilBunny",
-        "CID_376_Athena_Commando_M_DarkShaman": "BID_240_DarkShamanMale",
-        "CID_377_Athena_Commando_F_DarkShaman": "BID_241_DarkShamanFemale",
-        "CID_301_Athena_Commando_M_Rhino": "BID_171_Rhino",
-        "CID_365_Athena_Commando_M_LuckyRider": "BID_229_LuckyRiderMale",
-        "CID_361_Athena_Commando_M_BandageNinja": "BID_452_BandageNinjaBlue",
-        "CID_362_Athena_Commando_F_BandageNinja": "BID_226_BandageNinjaFemale",
-        "CID_378_Athena_Commando_M_FurnaceFace": "BID_242_FurnaceFace",
-        "CID_346_Athena_Commando_M_DragonNinja": "BID_216_PirateProgressive",
-        "CID_352_Athena_Commando_F_Shiny": "BID_217_ShinyFemale",
-        "CID_107_Athena_Commando_F_PajamaParty": "BID_041_PajamaParty",
-        "CID_093_Athena_Commando_M_Dinosaur": "BID_031_Dinosaur",
-        "CID_103_Athena_Commando_M_Bunny": "BID_037_BunnyMale",
-        "CID_104_Athena_Commando_F_Bunny ": "BID_038_BunnyFemale",
-        "CID_097_Athena_Commando_F_RockerPunk": "BID_034_RockerPunk",
-        "CID_134_Athena_Commando_M_Jailbird": "BID_053_JailbirdMale",
-        "CID_135_Athena_Commando_F_Jailbird": "BID_054_JailbirdFemale",
-        "CID_154_Athena_Commando_M_Gumshoe": "BID_062_Gumshoe",
-        "CID_155_Athena_Commando_F_Gumshoe": "BID_067_GumshoeFemale",
-        "CID_220_Athena_Commando_F_Clown": "BID_111_ClownFemale",
-        "CID_221_Athena_Commando_M_Clown ": "BID_112_ClownMale",
-        "CID_192_Athena_Commando_M_Hippie": "BID_093_HippieMale",
-        "CID_193_Athena_Commando_F_Hippie ": "BID_094_HippieFemale",
-        "CID_198_Athena_Commando_M_BlueSamurai": "BID_098_BlueSamuraiMale",
-        "CID_199_Athena_Commando_F_BlueSamurai": "BID_099_BlueSamuraiFemale",
-        "CID_328_Athena_Commando_F_Tennis": "BID_206_ScrapyardFemale",
-        "CID_334_Athena_Commando_M_Scrapyard": "BID_205_ScrapyardMale",
-        "CID_297_Athena_Commando_F_Math": "BID_170_MathFemale",
-        "CID_296_Athena_Commando_M_Math": "BID_169_MathMale",
-        "CID_345_Athena_Commando_M_LoveLlama": "BID_214_LoveLlama"
-
-        
-        
-        
-    }
+def select_layout_items(pool, layout, paired_featured_items, more_accurate, used_items, rng=None, cooldown=frozenset()):
+    items = {}
+    for section in layout:
+        items.update(select_section_items(pool, section, paired_featured_items, more_accurate, used_items, rng, cooldown))
+    return items
 
-    emotes_by_season = {
-        1: {
-            "rare": ["EID_FingerGuns", "EID_SlowClap"],
-            "super_rare": ["EID_Dab"],
-            "epic": ["EID_Fresh"]
-        },
-        2: {
-            "rare": ["EID_TrueLove", "EID_Flex", "EID_HeelClick", "EID_RockPaperScissors", 
-                     "EID_Celebration", "EID_DustOffShoulders", "EID_BreakYou", "EID_Facepalm"],
-            "super_rare": ["EID_KissKiss", "EID_PureSalt", "EID_Flapper", "EID_Tidy", 
-                           "EID_Confused", "EID_Wiggle", "EID_TapShuffle", "EID_IrishJig", 
-                           "EID_MakeItRain", "EID_SexyFlip"],
-            "epic": ["EID_EasternBloc", "EID_RockGuitar", "EID_DiscoFever", "EID_RocketRodeo", 
-                     "EID_Zombie", "EID_BreakDance"]
-        },
-        6: {
-            "rare": [
-                "EID_TimeOut", "EID_ScoreCard", "EID_Disagree", "EID_WolfHowl",
-                "EID_LookAtThis", "EID_TPose"
-            ],
-            "super_rare": [
-                "EID_CowboyDance", "EID_Showstopper", "EID_Mime", "EID_AfroHouse",
-                "EID_CrazyFeet", "EID_TaiChi", "EID_Touchdown", "EID_Texting",
-                "EID_CrissCross", "EID_Juggler", "EID_HalloweenCandy", "EID_HeadBang",
-                "EID_ElectroSwing", "EID_Sprinkler", "EID_SomethingStinks"
-            ],
-            "epic": [
-                "EID_Saxophone", "EID_Wizard", "EID_DJ01", "EID_KPopDance02"
-            ]
-        },
-        8: {
-            "rare": ["EID_JazzHands", "EID_MartialArts", "EID_Shadowboxing", "EID_WackyWavy"],
-            "super_rare": [
-                "EID_IndianDance", "EID_Bunnyhop", "EID_Breakboy", "EID_DreamFeet",
-                "EID_FancyWorkout", "EID_TimetravelBackflip", "EID_DrumMajor",
-                "EID_ThighSlapper", "EID_MakeItRainV2", "EID_Floppy", "EID_Spyglass"
-            ],
-            "epic": ["EID_FireDance"]
-        }
-    }
+def recent_items(rotation_date, cooldown_days=COOLDOWN_DAYS, history=None):
+    # Read once per rotation; the selectors only do set lookups against it.
+    if cooldown_days <= 0:
+        return frozenset()
+    history = history or rotation_history
+    return frozenset(history.items_since(rotation_date - timedelta(days=cooldown_days)))
 
-    pickaxes_by_season = {
-        1: {
-            "rare": ["Pickaxe_ID_014_WinterCamo", "Pickaxe_ID_022_HolidayGiftWrap"],
-            "super_rare": ["Pickaxe_ID_021_Megalodon", "Pickaxe_ID_020_Keg"],
-            "epic": [
-                "Pickaxe_ID_017_Shark", "Pickaxe_ID_018_Anchor", 
-                "Pickaxe_ID_016_Disco", "Pickaxe_ID_015_HolidayCandyCane",
-                "Pickaxe_Flamingo", "Pickaxe_Deathvalley", "Pickaxe_Lockjaw"
-            ]
-        },
-        2: {
-            "rare": ["Pickaxe_ID_032_Tactical"],
-            "super_rare": [
-                "Pickaxe_ID_025_Dragon", "Pickaxe_ID_019_Heart",
-                "Pickaxe_ID_024_Plunger", "Pickaxe_ID_023_SkiBoot",
-                "Pickaxe_ID_040_Pizza", "Pickaxe_ID_042_CircuitBreaker", 
-                "Pickaxe_ID_038_Carrot", "Pickaxe_ID_037_Stealth", 
-                "Pickaxe_ID_034_RockerPunk", "Pickaxe_ID_036_CuChulainn", 
-                "Pickaxe_ID_035_Prismatic", "Pickaxe_ID_030_ArtDeco"
-            ],
-            "epic": ["Pickaxe_ID_043_OrbitingPlanets", "Pickaxe_ID_041_PajamaParty", 
-                     "Pickaxe_ID_033_PotOfGold", "Pickaxe_ID_031_Squeak", 
-                     "Pickaxe_ID_026_Brite"]
-        },
-        6: {
-            "rare": [
-                "Pickaxe_ID_118_StreetOps", "Pickaxe_ID_125_Moth", "Pickaxe_ID_123_HornedMask",
-                "Pickaxe_ID_124_Feathers", "Pickaxe_ID_095_FootballTrophy", "Pickaxe_ID_096_FootballReferee",
-                "Pickaxe_ID_119_AnimalJackets", "Pickaxe_ID_101_Octoberfest"
-            ],
-            "super_rare": [
-                "Pickaxe_ID_112_GuanYu", "Pickaxe_ID_121_RobotRed", "Pickaxe_ID_120_SamuraiUltraArmor",
-                "Pickaxe_ID_122_Witch", "Pickaxe_ID_107_HalloweenTomato", "Pickaxe_ID_094_Football",
-                "Pickaxe_ID_117_MadCommander", "Pickaxe_ID_111_BlackWidow", "Pickaxe_ID_108_PumpkinSlice",
-                "Pickaxe_ID_107_Plague", "Pickaxe_ID_100_DieselPunk"
-            ],
-            "epic": [
-                "Pickaxe_ID_113_Muertos", "Pickaxe_ID_115_EvilCowboy", "Pickaxe_ID_110_Vampire",
-                "Pickaxe_ID_109_SkullTrooper"
-            ]
-        },
-        8: {
-            "rare": [
-                "Pickaxe_ID_201_Swashbuckler", "Pickaxe_ID_194_TheBomb",
-                "Pickaxe_ID_197_HoppityHeist", "Pickaxe_ID_198_BountyBunny",
-                "Pickaxe_ID_190_GolfClub", "Pickaxe_ID_183_BaseballBat2018",
-                "Pickaxe_ID_172_BandageNinja", "Pickaxe_ID_175_Tropical",
-                "Pickaxe_ID_168_Bandolier", "Pickaxe_ID_171_OrangeCamo"
-            ],
-            "super_rare": [
-                "Pickaxe_ID_179_StarWand", "Pickaxe_ID_204_Miner",
-                "Pickaxe_ID_199_ShinyHammer", "Pickaxe_ID_196_EvilBunny",
-                "Pickaxe_ID_192_PalmTree", "Pickaxe_ID_191_Banana",
-                "Pickaxe_ID_182_PirateWheel", "Pickaxe_ID_185_BadassCowboyCactus",
-                "Pickaxe_ID_184_DarkShaman", "Pickaxe_ID_181_Log",
-                "Pickaxe_ID_173_SciOps", "Pickaxe_ID_180_TriStar",
-                "Pickaxe_ID_174_LuckyRider", "Pickaxe_ID_170_Aztec",
-                "Pickaxe_ID_169_Farmer"
-            ],
-            "epic": [
-                "Pickaxe_ID_200_MoonlightAssassin", "Pickaxe_ID_186_DemonStone",
-                "Pickaxe_ID_127_Rhino", "Pickaxe_ID_176_DevilRock"
-            ]
-        }
-    }
+def rotate_shop(pool, paired_featured_items, more_accurate, rng=None, cooldown=frozenset(), layout=DEFAULT_LAYOUT):
+    # One shop from an already built pool; the index is restored afterwards
+    # so the same pool can be reused for the next rotation.
+    used_items = set()
+    try:
+        with span("select"):
+            items = select_layout_items(pool, layout, paired_featured_items, more_accurate, used_items, rng, cooldown)
+    finally:
+        pool.index.reset()
+    with span("add_items"):
+        return add_items(items, pool.records, rng)
+
+def utc_today():
+    # Rotations are dated in UTC in every mode (the daemon rotates on a UTC
+    # schedule), so history rows and cooldown windows line up between them.
+    return datetime.now(timezone.utc).date()
+
+def rotation_rng(master_seed, rotation_date):
+    # Each rotation's stream depends only on the master seed and its date, so
+    # shops can be regenerated individually and in any order.
+    digest = hashlib.sha256(f"{master_seed}:{rotation_date.isoformat()}".encode()).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+_worker_pools = {}
+
+def _generate_rotation_lines(args):
+    catalog_path, current_season, include_battle_pass, include_exclusives, more_accurate, seed, layout, dates = args
+    catalog = load_catalog(catalog_path)
+    pool_key = (catalog_path, current_season, include_battle_pass, include_exclusives)
+    if pool_key not in _worker_pools:
+        _worker_pools[pool_key] = build_item_pool(catalog, current_season, include_battle_pass, include_exclusives)
+    pool = _worker_pools[pool_key]
+    lines = []
+    for rotation_date in dates:
+        shop = rotate_shop(pool, catalog["paired_featured_items"], more_accurate, rotation_rng(seed, rotation_date), layout=layout)
+        lines.append(json.dumps({"date": rotation_date.isoformat(), "shop": shop}) + "\n")
+    return lines
+
+def generate_rotations(days, output_path, include_battle_pass, include_exclusives, more_accurate=False,
+                       start_date=None, current_season=CURRENT_SEASON, seed=None, workers=1, catalog_path=CATALOG_FILE,
+                       layout=DEFAULT_LAYOUT):
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(32)
+        print(f"Using seed {seed}")
+    start_date = start_date or utc_today()
+    dates = [start_date + timedelta(days=day) for day in range(days)]
+    chunk_size = max(1, min(1000, days // (workers * 4) or 1))
+    chunks = [
+        (catalog_path, current_season, include_battle_pass, include_exclusives, more_accurate, seed, layout, dates[i:i + chunk_size])
+        for i in range(0, days, chunk_size)
+    ]
+    with open(output_path, 'w') as f:
+        if workers > 1:
+            # Compile the pickle once here rather than in every worker at once.
+            load_catalog(catalog_path)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for lines in executor.map(_generate_rotation_lines, chunks):
+                    f.writelines(lines)
+        else:
+            for chunk in chunks:
+                f.writelines(_generate_rotation_lines(chunk))
+    print(f"{days} rotations saved to {output_path}")
 
-    pickaxes_battlepass_by_season = {
-        2: {
-            "epic": ["Pickaxe_ID_013_Teslacoil"],
-            "super_rare": ["Pickaxe_ID_012_District", "Pickaxe_ID_011_Medieval"]
-        },
-        6: {
-            "super_rare": [
-                "Pickaxe_ID_103_FortniteDJ", "Pickaxe_ID_102_RedRiding"
-            ]
-        },
-        8: {
-            "epic": ["Pickaxe_ID_200_MoonlightAssassin"],
-            "super_rare": ["Pickaxe_ID_167_Medusa", "Pickaxe_ID_165_MasterKey"]
-        }
-    }
+def main(include_battle_pass, include_exclusives, webhook_url, more_accurate=False, current_season=CURRENT_SEASON, seed=None,
+         cooldown_days=COOLDOWN_DAYS, layout=DEFAULT_LAYOUT):
+    print("Starting script...")
+    shop = {}
+    today = utc_today()
+    rng = rotation_rng(seed, today) if seed is not None else random
+    cooldown = recent_items(today, cooldown_days)
 
-    print("Combining items from all seasons up to the current season...")
-    combined_items = {"rare": [], "super_rare": [], "epic": [], "legendary": []}
-    combined_bp_items = {"rare": [], "super_rare": [], "epic": [], "legendary": []}
-    combined_exclusive_items = {"rare": [], "super_rare": [], "epic": [], "legendary": []}
-    
-    for season in range(1, current_season + 1):
-        if season in skins_by_season:
-            for rarity, items in skins_by_season[season].items():
-                combined_items[rarity].extend(items)
-        if include_battle_pass and season in skins_battlepass_by_season:
-            for rarity, items in skins_battlepass_by_season[season].items():
-                combined_bp_items[rarity].extend(items)
-        if season in emotes_by_season:
-            for rarity, items in emotes_by_season[season].items():
-                combined_items[rarity].extend(items)
-        if season in pickaxes_by_season:
-            for rarity, items in pickaxes_by_season[season].items():
-                combined_items[rarity].extend(items)
-        if include_battle_pass and season in pickaxes_battlepass_by_season:
-            for rarity, items in pickaxes_battlepass_by_season[season].items():
-                combined_bp_items[rarity].extend(items)
+    with span("load_catalog"):
+        catalog = load_catalog()
+    featured_images = catalog["featured_images"]
 
-    if include_battle_pass:
-        for rarity in combined_bp_items:
-            combined_items[rarity].extend(combined_bp_items[rarity])
-    
-    if include_exclusives:
-        for rarity, items in exclusive_items.items():
-            combined_exclusive_items[rarity].extend(items)
+    print("Combining items from all seasons up to the current season...")
+    with span("build_pool", season=current_season):
+        pool = build_item_pool(catalog, current_season, include_battle_pass, include_exclusives)
 
-    print("Selecting featured items...")
     used_items = set()
-    featured_items = {}
+    all_items = {}
+    for section in layout:
+        print(f"Selecting {section.name} items...")
+        with span("select", section=section.name):
+            section_items = select_section_items(pool, section, catalog["paired_featured_items"], more_accurate, used_items, rng, cooldown)
 
-    if more_accurate:
-        selected_season = random.choice(list(paired_featured_items.keys()))
-        selected_pair = random.choice(paired_featured_items[selected_season])
-        featured_items["featured1"] = selected_pair[0]
-        featured_items["featured2"] = selected_pair[1]
-    else:
-        featured_items["featured1"] = ensure_non_none_items(2, "AthenaCharacter", used_items, combined_items)
-        featured_items["featured2"] = ensure_non_none_items(2, "AthenaCharacter", used_items, combined_items)
-
-    print("Featured items selected: ", featured_items)
-
-    print("Selecting daily items...")
-    daily_items = {
-        "daily1": ensure_non_none_items(1, "AthenaDance", used_items, combined_items)[0],
-        "daily2": ensure_non_none_items(1, "AthenaPickaxe", used_items, combined_items)[0],
-        "daily3": ensure_non_none_items(1, "AthenaCharacter", used_items, combined_items)[0],
-        "daily4": ensure_non_none_items(1, "AthenaPickaxe", used_items, combined_items)[0],
-        "daily5": ensure_non_none_items(1, "AthenaDance", used_items, combined_items)[0],
-        "daily6": ensure_non_none_items(1, "AthenaDance", used_items, combined_items)[0]
-    }
-
-    print("Daily items selected: ", daily_items)
+        print(f"{section.name.capitalize()} items selected: ", section_items)
+        all_items.update(section_items)
 
-    all_items = {**daily_items, **featured_items}
-    shop.update(add_items(all_items, combined_items, backbling_mapping))
+    with span("add_items"):
+        shop.update(add_items(all_items, pool.records, rng))
 
     print("\nThe BR Item Shop Config is as follows:")
     print("{")
@@ -993,54 +1852,393 @@ def main(include_battle_pass, include_exclusives, webhook_url, more_accurate=Fal
             print("    }")
     print("}")
 
-    featured_images = {
-        "CID_107_Athena_Commando_F_PajamaParty": "https://fortnite.gg/img/items/820/featured.png?2",
-        "CID_093_Athena_Commando_M_Dinosaur": "https://fortnite.gg/img/items/834/featured.png?1",
-        "CID_104_Athena_Commando_F_Bunny": "https://fortnite.gg/img/items/823/featured.png?2",
-        "CID_103_Athena_Commando_M_Bunny": "https://fortnite.gg/img/items/824/featured.png?2",
-        "CID_097_Athena_Commando_F_RockerPunk": "https://fortnite.gg/img/items/830/featured.png?1",
-        "CID_268_Athena_Commando_M_RockerPunk": "https://fortnite.gg/img/items/661/featured.png?2",
-        "CID_123_Athena_Commando_F_Metal": "https://fortnite.gg/img/items/804/featured.png?2",
-        "CID_122_Athena_Commando_M_Metal": "https://fortnite.gg/img/items/805/featured.png?2",
-        "CID_135_Athena_Commando_F_Jailbird": "https://fortnite.gg/img/items/792/featured.png?1",
-        "CID_134_Athena_Commando_M_Jailbird": "https://fortnite.gg/img/items/793/featured.png?2",
-        "CID_154_Athena_Commando_M_Gumshoe": "https://fortnite.gg/img/items/773/featured.png?2",
-        "CID_155_Athena_Commando_F_Gumshoe": "https://fortnite.gg/img/items/772/featured.png?2",
-        "CID_124_Athena_Commando_F_AuroraGlow": "https://fortnite.gg/img/items/803/featured.png?1",
-        "CID_126_Athena_Commando_M_AuroraGlow": "https://fortnite.gg/img/items/801/featured.png?1",
-        "CID_220_Athena_Commando_F_Clown": "https://fortnite.gg/img/items/709/featured.png?2",
-        "CID_221_Athena_Commando_M_Clown": "https://fortnite.gg/img/items/708/featured.png?2",
-        "CID_192_Athena_Commando_M_Hippie": "https://fortnite.gg/img/items/736/featured.png?2",
-        "CID_193_Athena_Commando_F_Hippie": "https://fortnite.gg/img/items/735/featured.png?2",
-        "CID_198_Athena_Commando_M_BlueSamurai": "https://fortnite.gg/img/items/730/featured.png?2",
-        "CID_199_Athena_Commando_F_BlueSamurai": "https://fortnite.gg/img/items/729/featured.png?2",
-        "CID_328_Athena_Commando_F_Tennis": "https://fortnite.gg/img/items/610/featured.png?2",
-        "CID_334_Athena_Commando_M_Scrapyard": "https://fortnite.gg/img/items/604/featured.png?2",
-        "CID_297_Athena_Commando_F_Math": "https://fortnite.gg/img/items/638/featured.png?2",
-        "CID_296_Athena_Commando_M_Math": "https://fortnite.gg/img/items/639/icon.png?5",
-        "CID_345_Athena_Commando_M_LoveLlama": "https://fortnite.gg/img/items/593/featured.png?2",
-        "EID_KissKiss": "https://fortnite.gg/img/items/3863/featured.png?1",
-        "CID_398_Athena_Commando_M_TreasureHunterFashion": "https://fortnite.gg/img/items/544/featured.png?1",
-        "CID_397_Athena_Commando_F_TreasureHunterFashion": "https://fortnite.gg/img/items/545/featured.png?1",
-        "CID_394_Athena_Commando_M_MoonlightAssassin": "https://fortnite.gg/img/items/548/featured.png?1",
-        "CID_395_Athena_Commando_F_ShatterFly": "https://fortnite.gg/img/items/547/featured.png?2",
-        "CID_372_Athena_Commando_F_Pirate01": "https://fortnite.gg/img/items/567/featured.png?2",
-        "CID_373_Athena_Commando_M_Pirate01": "https://fortnite.gg/img/items/566/featured.png?2",
-        "CID_358_Athena_Commando_M_Aztec": "https://fortnite.gg/img/items/580/featured.png?1",
-        "CID_359_Athena_Commando_F_Aztec": "https://fortnite.gg/img/items/579/featured.png?1",
-        "CID_355_Athena_Commando_M_Farmer": "https://fortnite.gg/img/items/583/featured.png?1",
-        "CID_356_Athena_Commando_F_Farmer": "https://fortnite.gg/img/items/582/featured.png?1",
-        "CID_392_Athena_Commando_F_BountyBunny": "https://fortnite.gg/img/items/550/featured.png?1",
-        "CID_391_Athena_Commando_M_HoppityHeist": "https://fortnite.gg/img/items/551/featured.png?2"
-    }
-
-    save_to_file(shop)
-    generate_html(shop, featured_images)
+    publish_shop(shop, featured_images, webhook_url, today, layout=layout)
 
+    print("Script execution completed.")
     if webhook_url:
-        send_to_discord(webhook_url, shop)
+        with span("discord_flush"):
+            discord_outbox.flush()
+        discord_outbox.report()
+    if METRICS_FILE:
+        metrics.write(METRICS_FILE)
+
+def publish_shop(shop, featured_images, webhook_url, rotation_date, history=None, layout=DEFAULT_LAYOUT,
+                 config_path=None, html_path=None, fragments=None):
+    # Unset paths and stores fall back to the module defaults at call time.
+    history = history or rotation_history
+    with span("save_to_file"):
+        save_to_file(shop, config_path)
+    with span("record_history"):
+        history.record(rotation_date, shop)
+    with span("generate_html"):
+        generate_html(shop, featured_images, html_path, fragments, layout=layout)
 
-    print("Script execution completed.")
+    if webhook_url:
+        with span("send_to_discord"):
+            send_to_discord(webhook_url, shop, layout)
+
+def load_tenants(path):
+    # {"tenants": [{"name": "eu", "current_season": 6, "include_battle_pass": false, "include_exclusives": false,
+    #   "more_accurate": true, "webhooks": [...], "output_dir": "tenants/eu", "layout": "event.json"}, ...]}
+    # Relative output_dir and layout paths are resolved against the tenants file.
+    with open(path) as f:
+        raw = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    tenants = []
+    for entry in raw.get("tenants", []):
+        name = entry.get("name")
+        if not isinstance(name, str) or not name or name in [tenant.name for tenant in tenants]:
+            raise ValueError(f"Tenant names must be unique non-empty strings, got {name!r}")
+        output_dir = os.path.join(base, entry.get("output_dir", os.path.join("tenants", name)))
+        os.makedirs(output_dir, exist_ok=True)
+        webhooks = entry.get("webhooks", [])
+        if isinstance(webhooks, str):
+            webhooks = [webhooks]
+        tenants.append(Tenant(
+            name,
+            int(entry.get("current_season", CURRENT_SEASON)),
+            bool(entry.get("include_battle_pass", False)),
+            bool(entry.get("include_exclusives", False)),
+            bool(entry.get("more_accurate", True)),
+            webhooks,
+            output_dir,
+            load_layout(os.path.join(base, entry["layout"])) if entry.get("layout") else DEFAULT_LAYOUT,
+            RotationHistory(os.path.join(output_dir, 'rotation_history.db')),
+            FragmentCache(os.path.join(output_dir, 'item_shop.fragments.json')),
+        ))
+    if not tenants:
+        raise ValueError(f'No tenants found in {path}; expected a "tenants" list')
+    return tenants
+
+def rotate_tenants(tenants, catalog, pools, rotation_date, seed=None, cooldown_days=COOLDOWN_DAYS):
+    # Tenants with the same season and flags share one item pool from pools,
+    # built on first use; rotate_shop resets the index after every shop, so
+    # the sharing is safe. One tenant failing doesn't stop the others.
+    for tenant in tenants:
+        pool_key = (tenant.current_season, tenant.include_battle_pass, tenant.include_exclusives)
+        try:
+            if pool_key not in pools:
+                with span("build_pool", season=tenant.current_season):
+                    pools[pool_key] = build_item_pool(catalog, *pool_key)
+            # Per-tenant streams, so tenants sharing a pool still get different shops.
+            rng = rotation_rng(f"{seed}:{tenant.name}", rotation_date) if seed is not None else random
+            with span("rotation", tenant=tenant.name, date=rotation_date.isoformat()):
+                cooldown = recent_items(rotation_date, cooldown_days, tenant.history)
+                shop = rotate_shop(pools[pool_key], catalog["paired_featured_items"], tenant.more_accurate, rng, cooldown,
+                                   tenant.layout)
+                publish_shop(shop, catalog["featured_images"], tenant.webhooks, rotation_date, tenant.history, tenant.layout,
+                             os.path.join(tenant.output_dir, 'catalog_config.json'),
+                             os.path.join(tenant.output_dir, 'item_shop.html'), tenant.fragments)
+        except Exception as e:
+            print(f"[{tenant.name}] Rotation failed: {e}")
+            metrics.inc("rotation_failures_total", tenant=tenant.name)
+
+def run_tenants(tenants, seed=None, cooldown_days=COOLDOWN_DAYS):
+    with span("load_catalog"):
+        catalog = load_catalog()
+    pools = {}
+    rotate_tenants(tenants, catalog, pools, utc_today(), seed, cooldown_days)
+    print(f"{len(tenants)} tenant shop(s) generated from {len(pools)} item pool(s).")
+    if any(tenant.webhooks for tenant in tenants):
+        with span("discord_flush"):
+            discord_outbox.flush()
+        discord_outbox.report()
+    if METRICS_FILE:
+        metrics.write(METRICS_FILE)
+
+def next_rotation_time(now, rotate_at=ROTATE_AT):
+    hour, minute = map(int, rotate_at.split(":"))
+    rotation = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if rotation <= now:
+        rotation += timedelta(days=1)
+    return rotation
+
+class ShopContent:
+    # In-memory copy of the published page and catalog. Bodies are hashed and
+    # compressed once per publish, so serving a request is a dict lookup.
+    def __init__(self, files=None, rotate_at=ROTATE_AT):
+        self.files = files or {
+            "/": (HTML_FILE, "text/html; charset=utf-8"),
+            "/item_shop.html": (HTML_FILE, "text/html; charset=utf-8"),
+            "/catalog_config.json": (CONFIG_FILE, "application/json"),
+        }
+        self.rotate_at = rotate_at
+        self.served = {}
+        self.expires = None
+        self.version = None
+        self.mtimes = None
+        self.checked = 0
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    def file_mtimes(self):
+        mtimes = {}
+        for path, _ in self.files.values():
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def publish(self, expires=None):
+        mtimes = self.file_mtimes()
+        bodies_by_path = {}
+        served = {}
+        for route, (path, content_type) in self.files.items():
+            if path not in bodies_by_path:
+                try:
+                    with open(path, 'rb') as f:
+                        body = f.read()
+                except OSError:
+                    continue
+                bodies = {"identity": body, "gzip": gzip.compress(body, 9)}
+                if brotli:
+                    bodies["br"] = brotli.compress(body)
+                bodies_by_path[path] = (hashlib.sha256(body).hexdigest()[:32], bodies)
+            etag, bodies = bodies_by_path[path]
+            served[route] = ServedFile(content_type, etag, bodies)
+        # Announce the version of the page actually served: the config is
+        # written before the page, and pages reload on a version they don't
+        # carry.
+        version = page_version(served["/"].bodies["identity"]) if "/" in served else None
+        with self.lock:
+            self.served = served
+            self.expires = expires or next_rotation_time(datetime.now(timezone.utc), self.rotate_at)
+            self.mtimes = mtimes
+            if version != self.version:
+                self.version = version
+                self.changed.notify_all()
+
+    def check_files(self):
+        # Standalone servers pick up files rewritten by another process; the
+        # stat is throttled to once a second.
+        now = time.monotonic()
+        if now - self.checked > 1:
+            self.checked = now
+            if self.file_mtimes() != self.mtimes:
+                self.publish()
+
+    def get(self, route):
+        self.check_files()
+        with self.lock:
+            return self.served.get(route), self.expires
+
+    def wait_for_version(self, seen, timeout):
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != seen, timeout)
+            return self.version
+
+def accepted_encodings(header):
+    encodings = set()
+    for part in (header or "").split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        q = params.strip().replace(" ", "")
+        if q.startswith("q=") and not q[2:].strip("0."):
+            continue
+        if name:
+            encodings.add(name)
+    return encodings
+
+class ShopRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    content = None
+
+    def do_GET(self):
+        route = urlsplit(self.path).path
+        if route == "/events":
+            self.send_events()
+        elif route == "/metrics":
+            self.send_metrics()
+        else:
+            self.send_file(head=False)
+
+    def send_metrics(self):
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_events(self):
+        # Server-Sent Events: the current shop version right away, then one
+        # "rotation" event per change, with comment keepalives in between.
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        sent = object()
+        last_write = time.monotonic()
+        try:
+            self.wfile.write(b"retry: 5000\n\n")
+            while True:
+                self.content.check_files()
+                version = self.content.wait_for_version(sent, timeout=min(5, EVENTS_KEEPALIVE))
+                if version != sent:
+                    sent = version
+                    self.wfile.write(f"event: rotation\ndata: {version or ''}\n\n".encode())
+                elif time.monotonic() - last_write >= EVENTS_KEEPALIVE:
+                    self.wfile.write(b": keepalive\n\n")
+                else:
+                    continue
+                self.wfile.flush()
+                last_write = time.monotonic()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_HEAD(self):
+        self.send_file(head=True)
+
+    def send_file(self, head):
+        route = urlsplit(self.path).path
+        served, expires = self.content.get(route)
+        if served is None:
+            if route.startswith("/images/"):
+                self.send_image(route, head)
+            else:
+                self.send_error(404)
+            return
+        accepted = accepted_encodings(self.headers.get("Accept-Encoding"))
+        encoding = "identity"
+        if "br" in accepted and "br" in served.bodies:
+            encoding = "br"
+        elif "gzip" in accepted:
+            encoding = "gzip"
+        # Each encoding is a distinct representation, so it gets its own strong tag.
+        etag = f'"{served.etag}"' if encoding == "identity" else f'"{served.etag}-{encoding}"'
+        max_age = max(0, int((expires - datetime.now(timezone.utc)).total_seconds()))
+        if_none_match = self.headers.get("If-None-Match", "")
+        not_modified = if_none_match.strip() == "*" or etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        body = served.bodies[encoding]
+        if not_modified:
+            self.send_response(304)
+        else:
+            self.send_response(200)
+            self.send_header("Content-Type", served.content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if encoding != "identity":
+                self.send_header("Content-Encoding", encoding)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", f"public, max-age={max_age}")
+        self.send_header("Vary", "Accept-Encoding")
+        self.end_headers()
+        if not head and not not_modified:
+            self.wfile.write(body)
+
+    def send_image(self, route, head):
+        path = os.path.normpath(os.path.join(IMAGES_DIR, route[len("/images/"):]))
+        found = os.path.commonpath([path, IMAGES_DIR]) == IMAGES_DIR and os.path.isfile(path)
+        guessed = mimetypes.guess_type(path)[0]
+        # Only ever serve images from our origin, whatever ended up on disk.
+        if not found or (guessed and not guessed.startswith("image/")):
+            self.send_error(404)
+            return
+        with open(path, 'rb') as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", guessed or "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        # Cached art is named after its content hash, so it never changes.
+        if os.path.dirname(path) == IMAGE_CACHE_DIR:
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        else:
+            self.send_header("Cache-Control", "public, max-age=86400")
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(content, port, host=SERVE_HOST):
+    handler = type("BoundShopRequestHandler", (ShopRequestHandler,), {"content": content})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving shop on http://{host}:{server.server_port}/")
+    return server
+
+def serve_forever(port, host=SERVE_HOST, rotate_at=ROTATE_AT):
+    content = ShopContent(rotate_at=rotate_at)
+    content.publish()
+    server = start_server(content, port, host)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+def run_daemon(include_battle_pass, include_exclusives, webhook_url, more_accurate=False, rotate_at=ROTATE_AT,
+               current_season=CURRENT_SEASON, seed=None, serve_port=None, serve_host=SERVE_HOST, cooldown_days=COOLDOWN_DAYS,
+               layout=DEFAULT_LAYOUT, tenants=None):
+    # Resident rotator: the catalog, item pool, name cache and card fragments
+    # stay loaded between rotations. Rotates daily at rotate_at (UTC); SIGUSR1
+    # rotates immediately, SIGINT/SIGTERM stop the loop. With tenants, every
+    # tenant's shop is rotated instead of the single default one; the server
+    # only knows the default page, so it can't be combined with tenants.
+    if tenants and serve_port is not None:
+        raise ValueError("Serving is not supported with tenants; serve each tenant's output_dir separately")
+    with span("load_catalog"):
+        catalog = load_catalog()
+    pools = {}
+    if not tenants:
+        with span("build_pool", season=current_season):
+            pool = build_item_pool(catalog, current_season, include_battle_pass, include_exclusives)
+    if discord_outbox.pending():
+        discord_outbox.start()
+    content = None
+    if serve_port is not None:
+        content = ShopContent(rotate_at=rotate_at)
+        content.publish()
+        start_server(content, serve_port, serve_host)
+    wake = threading.Event()
+    state = {"rotate_now": False, "stop": False}
+
+    def request_rotation(signum, frame):
+        state["rotate_now"] = True
+        wake.set()
+
+    def request_stop(signum, frame):
+        state["stop"] = True
+        wake.set()
+
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, request_rotation)
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    next_rotation = next_rotation_time(datetime.now(timezone.utc), rotate_at)
+    print(f"Shop daemon started (pid {os.getpid()}), next rotation at {next_rotation.isoformat()}")
+    while not state["stop"]:
+        now = datetime.now(timezone.utc)
+        if not state["rotate_now"] and now < next_rotation:
+            # Wake at least once a minute so clock changes and suspends are noticed.
+            wake.wait(min(60, (next_rotation - now).total_seconds()))
+            wake.clear()
+            continue
+        state["rotate_now"] = False
+        if tenants:
+            rotate_tenants(tenants, catalog, pools, now.date(), seed, cooldown_days)
+        else:
+            rng = rotation_rng(seed, now.date()) if seed is not None else random
+            try:
+                with span("rotation", date=now.date().isoformat()):
+                    cooldown = recent_items(now.date(), cooldown_days)
+                    shop = rotate_shop(pool, catalog["paired_featured_items"], more_accurate, rng, cooldown, layout)
+                    publish_shop(shop, catalog["featured_images"], webhook_url, now.date(), layout=layout)
+            except Exception as e:
+                print(f"Rotation failed: {e}")
+                metrics.inc("rotation_failures_total")
+        if METRICS_FILE:
+            metrics.write(METRICS_FILE)
+        next_rotation = next_rotation_time(datetime.now(timezone.utc), rotate_at)
+        if content:
+            content.publish(next_rotation)
+        print(f"Next rotation at {next_rotation.isoformat()}")
+    print("Shop daemon stopped.")
 
 if __name__ == "__main__":
     include_battle_pass = False
@@ -1048,4 +2246,53 @@ if __name__ == "__main__":
     webhook_url = "https://discord.com/api/webhooks/1299010730191880245/k1LhaNt815gbGWCJddXaBEUtmiewA3ZAcT8n7BZkRbwLfuvflOHeOGvv7LHl6DX-yt-o"
     more_accurate = True
 
-    main(include_battle_pass, include_exclusives, webhook_url, more_accurate)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Izen item shop rotator")
+    parser.add_argument("--batch", type=int, metavar="DAYS", help="generate DAYS rotations into a JSON-lines file")
+    parser.add_argument("--output", default=ROTATIONS_FILE, help="output file for --batch")
+    parser.add_argument("--start-date", type=date.fromisoformat, help="first rotation date for --batch (YYYY-MM-DD)")
+    parser.add_argument("--seed", type=int, help="master seed; each rotation is seeded from it and its date")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes for --batch")
+    parser.add_argument("--daemon", action="store_true", help="stay resident and rotate daily (SIGUSR1 rotates now)")
+    parser.add_argument("--rotate-at", default=ROTATE_AT, help="daily rotation time for --daemon, HH:MM UTC")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="serve the shop page and catalog over HTTP")
+    parser.add_argument("--host", default=SERVE_HOST, help="bind address for --serve")
+    parser.add_argument("--import-cosmetics", metavar="DUMP", help="build the offline metadata store from a fortnite-api.com cosmetics dump")
+    parser.add_argument("--offline", action="store_true", help="never call fortnite-api.com; use the metadata store and caches only")
+    parser.add_argument("--webhook", action="append", help="Discord webhook to announce the shop to (repeatable)")
+    parser.add_argument("--log-json", action="store_true", help="log stage timings, HTTP calls and events as JSON lines on stderr")
+    parser.add_argument("--metrics-file", help="write Prometheus metrics to this file after each rotation")
+    parser.add_argument("--tenants", help="JSON list of tenants; generate one shop per tenant into its own output directory")
+    parser.add_argument("--layout", help="JSON shop layout (sections, slots, categories, rarity weights)")
+    parser.add_argument("--cooldown", type=int, default=COOLDOWN_DAYS, metavar="DAYS",
+                        help="skip items shown in the last DAYS days when possible (0 disables)")
+    parser.add_argument("--last-seen", metavar="ITEM", help="print the last date ITEM was in the shop and exit")
+    args = parser.parse_args()
+    OFFLINE = args.offline
+    METRICS_FILE = args.metrics_file
+    if args.log_json:
+        configure_logging()
+    layout = load_layout(args.layout) if args.layout else DEFAULT_LAYOUT
+    if args.tenants and args.serve is not None:
+        parser.error("--serve cannot be combined with --tenants; serve each tenant's output_dir separately")
+    tenants = load_tenants(args.tenants) if args.tenants else None
+    if args.webhook:
+        webhook_url = args.webhook
+
+    if args.import_cosmetics:
+        import_cosmetics(args.import_cosmetics)
+    elif args.last_seen:
+        seen = rotation_history.last_seen(args.last_seen)
+        print(f"{args.last_seen} last in the shop on {seen.isoformat()}" if seen else f"{args.last_seen} has never been in the shop")
+    elif args.daemon:
+        run_daemon(include_battle_pass, include_exclusives, webhook_url, more_accurate, args.rotate_at, seed=args.seed,
+                   serve_port=args.serve, serve_host=args.host, cooldown_days=args.cooldown, layout=layout, tenants=tenants)
+    elif tenants:
+        run_tenants(tenants, seed=args.seed, cooldown_days=args.cooldown)
+    elif args.serve is not None:
+        serve_forever(args.serve, args.host, args.rotate_at)
+    elif args.batch:
+        generate_rotations(args.batch, args.output, include_battle_pass, include_exclusives, more_accurate,
+                           args.start_date, seed=args.seed, workers=args.workers, layout=layout)
+    else:
+        main(include_battle_pass, include_exclusives, webhook_url, more_accurate, seed=args.seed, cooldown_days=args.cooldown,
+             layout=layout)
\ No newline at end of file